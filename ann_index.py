@@ -0,0 +1,222 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import normalize
+from recommendation_core import build_item_neighbors, interaction_matrix_from_ids
+from vocabulary import encode_customers, encode_products, load_product_names, vocabulary_hash
+
+# Path to cleaned transaction dataset and output path of the serialized ANN index
+clean_path = "data/online_retail_cleaned.parquet"
+ann_index_path = "models/product_ann_index.npz"
+
+# Number of coarse clusters (inverted lists); None = sqrt(number of products)
+n_lists = None
+
+# Number of closest lists scanned per query (higher = better recall, slower queries)
+n_probe = 8
+
+# Number of recommendations used for the recall@K report
+top_n = 5
+
+
+# ------------------------------------------------------------
+# Build an IVF (inverted file) index over the product vectors
+# 1. Product vectors (customer purchase quantities) are L2-normalised so dot product = cosine
+# 2. KMeans on the unit vectors partitions products into coarse lists
+# 3. Product rows are stored grouped by list, so each probed list is one contiguous CSR slice
+# Columns of interaction_matrix are the ids of product_names (the published vocabulary); the index
+# records the vocabulary's fingerprint so it is never queried with ids of another vocabulary
+# ------------------------------------------------------------
+def build_ivf_index(interaction_matrix, product_names, n_lists=None, random_state=42):
+    if interaction_matrix.shape[1] != len(product_names):
+        raise ValueError(f"Matrix has {interaction_matrix.shape[1]} product columns, vocabulary has {len(product_names)}")
+    item_vectors = normalize(interaction_matrix.T.tocsr().astype(np.float32))
+    n_items = item_vectors.shape[0]
+    n_lists = n_lists or max(1, int(np.sqrt(n_items)))
+
+    kmeans = KMeans(n_clusters=n_lists, random_state=random_state, n_init=1)
+    assignments = kmeans.fit_predict(item_vectors)
+    centroids = normalize(kmeans.cluster_centers_).astype(np.float32)
+
+    # Reorder product rows so that every list is a contiguous block
+    order = np.argsort(assignments, kind="stable").astype(np.int32)
+    list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]).astype(np.int64)
+    vectors = item_vectors[order].tocsr()
+
+    return {
+        "centroids": centroids,
+        "list_offsets": list_offsets,
+        "list_items": order,
+        "item_positions": np.argsort(order).astype(np.int32),
+        "vectors": vectors,
+        "vocab_hash": vocabulary_hash(product_names),
+    }
+
+
+# ------------------------------------------------------------
+# Append products added to the vocabulary since the build (ids at the end, like incremental_similarity.py)
+# New products get empty vectors in the last list, which is the last block of rows, so every list stays
+# contiguous; they score 0 until the next full build. Returns None if the index was built against a
+# vocabulary that is not the start of product_names (the index has to be rebuilt)
+# ------------------------------------------------------------
+def pad_ivf_index(index, product_names):
+    n_old = len(index["item_positions"])
+    if index["vocab_hash"] != vocabulary_hash(product_names[:n_old]):
+        return None
+    missing = len(product_names) - n_old
+    vectors = index["vectors"]
+    new_ids = np.arange(n_old, n_old + missing, dtype=np.int32)
+    list_offsets = index["list_offsets"].copy()
+    list_offsets[-1] += missing
+    return {
+        "centroids": index["centroids"],
+        "list_offsets": list_offsets,
+        "list_items": np.concatenate([index["list_items"], new_ids]),
+        "item_positions": np.concatenate([index["item_positions"], vectors.shape[0] + np.arange(missing, dtype=np.int32)]),
+        "vectors": sparse.vstack([vectors, sparse.csr_matrix((missing, vectors.shape[1]), dtype=vectors.dtype)]).tocsr(),
+        "vocab_hash": vocabulary_hash(product_names),
+    }
+
+
+# ------------------------------------------------------------
+# Save / load the index as plain arrays in one .npz file next to the other model artifacts
+# Written to a temp file and renamed, like the other artifacts
+# Loading with product_names refuses an index built against a different vocabulary
+# ------------------------------------------------------------
+def save_ivf_index(path, index):
+    vectors = index["vectors"]
+    tmp_path = path[:-len(".npz")] + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        centroids=index["centroids"],
+        list_offsets=index["list_offsets"],
+        list_items=index["list_items"],
+        item_positions=index["item_positions"],
+        vectors_data=vectors.data,
+        vectors_indices=vectors.indices,
+        vectors_indptr=vectors.indptr,
+        vectors_shape=np.array(vectors.shape),
+        vocab_hash=np.array(index["vocab_hash"]),
+    )
+    os.replace(tmp_path, path)
+
+
+def load_ivf_index(path, product_names=None):
+    arrays = np.load(path)
+    # Indexes saved before the fingerprint was recorded have none and never match a vocabulary
+    vocab_hash = str(arrays["vocab_hash"]) if "vocab_hash" in arrays else None
+    if product_names is not None and vocab_hash != vocabulary_hash(product_names):
+        raise ValueError(f"{path} was built against a different product vocabulary; rebuild it with ann_index.py")
+    vectors = sparse.csr_matrix(
+        (arrays["vectors_data"], arrays["vectors_indices"], arrays["vectors_indptr"]),
+        shape=tuple(arrays["vectors_shape"])
+    )
+    return {
+        "centroids": arrays["centroids"],
+        "list_offsets": arrays["list_offsets"],
+        "list_items": arrays["list_items"],
+        "item_positions": arrays["item_positions"],
+        "vectors": vectors,
+        "vocab_hash": vocab_hash,
+    }
+
+
+# ------------------------------------------------------------
+# Approximate top-N similar products for one product id
+# Only the n_probe lists whose centroids are closest to the product are scored exactly
+# Scoring works directly on the CSR arrays (no sparse-matrix slicing), which keeps queries sub-millisecond
+# Returns product ids and cosine scores, best first, with the query product excluded
+# ------------------------------------------------------------
+def recommend_products_ann(index, product_id, top_n=5, n_probe=8):
+    vectors = index["vectors"]
+    data, columns, indptr = vectors.data, vectors.indices, vectors.indptr
+    offsets = index["list_offsets"]
+
+    # Dense copy of the query product vector
+    row = index["item_positions"][product_id]
+    query = np.zeros(vectors.shape[1], dtype=np.float32)
+    query[columns[indptr[row]:indptr[row + 1]]] = data[indptr[row]:indptr[row + 1]]
+
+    centroid_scores = index["centroids"] @ query
+    n_probe = min(n_probe, len(centroid_scores))
+    probe_lists = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+
+    # Rows of all probed lists, and the positions of their non-zeros in the CSR arrays
+    rows = np.concatenate([np.arange(offsets[l], offsets[l + 1]) for l in probe_lists])
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    nnz = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+    # Sparse dot product of every candidate row with the query, summed per row
+    scores = np.bincount(
+        np.repeat(np.arange(len(rows)), counts),
+        weights=data[nnz] * query[columns[nnz]],
+        minlength=len(rows)
+    )
+    candidates = index["list_items"][rows]
+
+    keep = candidates != product_id
+    candidates, scores = candidates[keep], scores[keep]
+
+    n = min(top_n, len(candidates))
+    if n == 0:
+        return candidates, scores
+    best = np.argpartition(-scores, n - 1)[:n]
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return candidates[best], scores[best].astype(np.float32)
+
+
+if __name__ == "__main__":
+    # Load cleaned data and build the interaction matrix on the published product vocabulary
+    # (models/product_vocab.parquet), so index ids are the ids the app and the other artifacts use
+    df = pd.read_parquet(clean_path)
+    df = df[["CustomerID", "Description", "Quantity"]].dropna(subset=["CustomerID", "Description"])
+
+    product_names = load_product_names()
+    customer_ids = np.sort(df["CustomerID"].unique())
+    product_codes = encode_products(df["Description"], product_names)
+    known = product_codes >= 0
+    interaction_matrix = interaction_matrix_from_ids(
+        encode_customers(df["CustomerID"], customer_ids)[known],
+        product_codes[known],
+        df["Quantity"].to_numpy()[known],
+        shape=(len(customer_ids), len(product_names))
+    )
+    print("Customer-Product Matrix Shape:", interaction_matrix.shape)
+
+    start = time.perf_counter()
+    index = build_ivf_index(interaction_matrix, product_names, n_lists=n_lists)
+    print(f"IVF index built in {time.perf_counter() - start:.2f}s with {len(index['centroids'])} lists")
+
+    # ------------------------------------------------------------
+    # Recall@K against the exact cosine engine
+    # Ground truth = exact top-N neighbours from the blocked similarity builder
+    # ------------------------------------------------------------
+    exact_indices, _ = build_item_neighbors(interaction_matrix, top_n)
+
+    hits = 0
+    latencies = []
+    for product_id in range(len(product_names)):
+        t0 = time.perf_counter()
+        approx_ids, _ = recommend_products_ann(index, product_id, top_n=top_n, n_probe=n_probe)
+        latencies.append(time.perf_counter() - t0)
+        hits += len(np.intersect1d(approx_ids, exact_indices[product_id]))
+
+    latencies = np.array(latencies) * 1000
+    print(f"Recall@{top_n} vs exact cosine (n_probe={n_probe}): {hits / exact_indices.size:.3f}")
+    print(f"Query latency: median {np.median(latencies):.3f} ms, p99 {np.percentile(latencies, 99):.3f} ms")
+
+    save_ivf_index(ann_index_path, index)
+    print("Saved:")
+    print(ann_index_path)
+
+# Q1. Why use an IVF index instead of exact all-pairs cosine similarity?
+# Answer: Exact similarity compares every product with every other product, which grows quadratically with the catalog.
+# IVF only scores products in a few nearby clusters, so query cost stays small as the catalog grows.
+
+# Q2. Why do we report recall@5 against the exact engine?
+# Answer: Approximate search can miss true neighbours, so recall shows how much quality we trade for speed.
+# n_probe can then be tuned until recall is acceptable for the business.
@@ -0,0 +1,279 @@
+import json
+import os
+import joblib
+import pandas as pd
+import streamlit as st
+from artifact_watcher import HotArtifacts
+from build_sales_cube import dimensions as cube_dimensions
+from customer_index import current_pointer, customer_index_dir, load_customer_index
+from product_search import load_search_index, search_index_path
+from recommendation_core import load_artifact_info, load_neighbor_artifact
+from segment_recommendations import (
+    load_segment_artifacts,
+    segment_map_path,
+    segment_neighbors_prefix,
+    segment_popularity_path,
+)
+from serving_store import ServingStore, store_dir
+from serving_store import current_pointer as store_current_pointer
+from vocabulary import load_product_names, product_vocab_path, vocabulary_hash
+
+# ------------------------------------------------------------
+# Shared artifact loading for the Streamlit pages
+# Streamlit reruns a page script on every widget interaction, so every model file, pickle and snapshot
+# is loaded once per server process and reused by all sessions.
+# All artifacts live in one HotArtifacts registry (artifact_watcher.py): an artifact is loaded the first
+# time a page asks for it, then a watchdog observer watches its files. When a pipeline script writes a
+# new version, a background thread loads and validates it and swaps the reference, so page reruns
+# never load files themselves; a broken or half-written artifact leaves the previous version in place.
+# Artifacts that refer to each other's ids are swapped as a group (see get_recommendation_artifacts).
+# ------------------------------------------------------------
+
+# Artifact paths used by the app
+scaler_path = "models/scaler.pkl"
+kmeans_path = "models/kmeans_model_k4.pkl"
+neighbors_prefix = "models/product_neighbors"
+bought_together_prefix = "models/product_bought_together"
+business_kpis_path = "data/business_kpis.json"
+sales_cube_path = "data/sales_cube.parquet"
+
+customer_index_pointer = os.path.join(customer_index_dir, current_pointer)
+serving_store_pointer = os.path.join(store_dir, store_current_pointer)
+kpi_keys = ["total_customers", "total_transactions", "total_products", "total_revenue", "segment_counts"]
+cube_columns = cube_dimensions + ["Revenue", "Quantity", "Invoices", "Customers"]
+
+
+def _neighbor_files(prefix):
+    return f"{prefix}_indices.npy", f"{prefix}_scores.npy", f"{prefix}_scale.npy"
+
+
+# One registry and watcher thread per server process
+@st.cache_resource(show_spinner=False)
+def _hot_artifacts():
+    return HotArtifacts().start()
+
+
+def _get(name, paths, loader, validate=None):
+    artifacts = _hot_artifacts()
+    artifacts.register(name, paths, loader, validate)
+    return artifacts.get(name)
+
+
+# Optional artifacts load as None while any of their files is missing
+def _optional(paths, loader):
+    return lambda: loader() if all(os.path.exists(p) for p in paths) else None
+
+
+# ------------------------------------------------------------
+# Validation of a newly loaded version before it replaces the current one
+# ------------------------------------------------------------
+def _check(condition, message):
+    if not condition:
+        raise ValueError(message)
+
+
+def _validate_segmentation_models(models):
+    scaler, kmeans = models
+    _check(scaler.n_features_in_ == 3 and kmeans.n_features_in_ == 3, "scaler and KMeans must use 3 RFM features")
+
+
+def _validate_neighbors(neighbors):
+    indices, scores = neighbors
+    _check(indices.ndim == 2 and indices.shape == scores.shape, "neighbour indices and scores must have the same 2-D shape")
+
+
+def _validate_segment_artifacts(artifacts):
+    indices, scores, popularity = artifacts
+    _check(indices.ndim == 3 and indices.shape == scores.shape, "segment indices and scores must have the same 3-D shape")
+    _check(popularity.shape == indices.shape[:2], "segment popularity must have one row per segment and product")
+
+
+def _validate_customer_index(index):
+    ids = index["customer_ids"]
+    _check(len(ids) == len(index["rfm"]) == len(index["clusters"]), "customer index columns have different lengths")
+    _check(len(ids) < 2 or bool((ids[1:] > ids[:-1]).all()), "customer ids must be sorted and unique")
+
+
+def _validate_kpis(kpis):
+    missing = [key for key in kpi_keys if key not in kpis]
+    _check(not missing, f"KPI snapshot is missing {missing}")
+
+
+def _validate_cube(cube):
+    missing = [column for column in cube_columns if column not in cube.columns]
+    _check(not missing, f"sales cube is missing columns {missing}")
+
+
+# ------------------------------------------------------------
+# Segmentation models (page 1)
+# ------------------------------------------------------------
+def get_segmentation_models():
+    return _get(
+        "segmentation_models", [scaler_path, kmeans_path],
+        lambda: (joblib.load(scaler_path), joblib.load(kmeans_path)),
+        _validate_segmentation_models,
+    )
+
+
+# Cluster id -> segment label
+def _load_segment_map():
+    with open(segment_map_path, "r") as f:
+        return {int(k): v for k, v in json.load(f).items()}
+
+
+def get_segment_map():
+    return _get("segment_map", [segment_map_path], _load_segment_map)
+
+
+# CustomerID -> RFM, cluster and segment index written by segment_labeling.py (None if it has not been built)
+# Only the CURRENT pointer is watched: a new version is complete on disk before the pointer changes
+def get_customer_index():
+    paths = [customer_index_pointer, segment_map_path]
+    return _get("customer_index", paths, _optional(paths, load_customer_index), _validate_customer_index)
+
+
+# ------------------------------------------------------------
+# Recommendation artifacts (page 2)
+# Neighbour arrays stay memory-mapped; the registry only keeps the mapping, not a copy
+# Optional artifacts return None when their files do not exist
+# ------------------------------------------------------------
+def get_neighbors():
+    return _get(
+        "neighbors", _neighbor_files(neighbors_prefix),
+        lambda: load_neighbor_artifact(neighbors_prefix),
+        _validate_neighbors,
+    )
+
+
+def get_bought_together():
+    paths = _neighbor_files(bought_together_prefix)
+    return _get(
+        "bought_together", paths,
+        _optional(paths[:2], lambda: load_neighbor_artifact(bought_together_prefix)),
+        _validate_neighbors,
+    )
+
+
+def get_segment_artifacts():
+    indices_path, scores_path, _ = _neighbor_files(segment_neighbors_prefix)
+    paths = [indices_path, scores_path, segment_popularity_path]
+    return _get("segment_artifacts", paths, _optional(paths, load_segment_artifacts), _validate_segment_artifacts)
+
+
+# Product names and the vocabulary fingerprint, computed once per loaded version
+def _load_vocabulary():
+    product_names = load_product_names(product_vocab_path)
+    return product_names, vocabulary_hash(product_names)
+
+
+def get_vocabulary():
+    return _get("vocabulary", [product_vocab_path], _load_vocabulary)
+
+
+def get_search_index():
+    return _get("search_index", [search_index_path], lambda: load_search_index(search_index_path))
+
+
+# Fingerprints of the vocabulary the .npy artifacts were built against, from their _info.json files
+# (None for artifacts saved before fingerprints were recorded); the search index stores its own
+stamped_prefixes = {
+    "neighbors": neighbors_prefix,
+    "bought_together": bought_together_prefix,
+    "segment_artifacts": segment_neighbors_prefix,
+}
+
+
+def get_vocab_stamps():
+    return _get(
+        "vocab_stamps", [f"{prefix}_info.json" for prefix in stamped_prefixes.values()],
+        lambda: {name: load_artifact_info(prefix).get("vocab_hash") for name, prefix in stamped_prefixes.items()},
+    )
+
+
+# ------------------------------------------------------------
+# Page 2 artifacts index into each other (neighbour, rule, segment and search result ids are product ids),
+# so they are linked into one group: reloaded, validated and swapped together
+# ------------------------------------------------------------
+recommendation_group = ["vocabulary", "vocab_stamps", "neighbors", "bought_together", "segment_artifacts", "search_index"]
+
+
+def _vocab_stamp(artifacts, name):
+    if name == "search_index":
+        return artifacts["search_index"].get("vocab_hash")
+    return artifacts["vocab_stamps"][name]
+
+
+# Whether an artifact's ids are ids of the loaded vocabulary: its recorded fingerprint when it has one,
+# otherwise (older builds) only the product axis can be compared
+# Product axis: rows of (products x K) arrays, second axis of (segments x products x K) arrays
+def _built_against(artifacts, name, product_names, vocab_hash):
+    stamp = _vocab_stamp(artifacts, name)
+    if stamp is not None:
+        return stamp == vocab_hash
+    if name == "search_index":
+        return len(artifacts[name]["gram_counts"]) == len(product_names)
+    indices = artifacts[name][0]
+    return indices.shape[indices.ndim - 2] == len(product_names)
+
+
+# Neighbours and the search index must belong to the loaded vocabulary, otherwise the whole group keeps
+# its previous version (e.g. a vocabulary written before the neighbours that go with it)
+def _validate_recommendation_group(artifacts):
+    product_names, vocab_hash = artifacts["vocabulary"]
+    for name in ["neighbors", "search_index"]:
+        _check(_built_against(artifacts, name, product_names, vocab_hash), f"{name} was built against a different product vocabulary")
+    indices = artifacts["neighbors"][0]
+    _check(indices.size == 0 or int(indices.max()) < len(product_names), "neighbors refer to products outside the vocabulary")
+
+
+# All page 2 artifacts from the same swap; the vocabulary is returned as product_names and vocab_hash
+# Bought-together and segment lists built against another vocabulary (their script has not been re-run
+# since the last rebuild) are returned as None instead of blocking the group
+def get_recommendation_artifacts():
+    get_vocabulary()
+    get_vocab_stamps()
+    get_neighbors()
+    get_bought_together()
+    get_segment_artifacts()
+    get_search_index()
+    hot_artifacts = _hot_artifacts()
+    hot_artifacts.link(recommendation_group, _validate_recommendation_group)
+    artifacts = hot_artifacts.snapshot(recommendation_group)
+
+    product_names, vocab_hash = artifacts.pop("vocabulary")
+    for name in ["bought_together", "segment_artifacts"]:
+        if artifacts[name] is not None and not _built_against(artifacts, name, product_names, vocab_hash):
+            artifacts[name] = None
+    del artifacts["vocab_stamps"]
+    artifacts["product_names"], artifacts["vocab_hash"] = product_names, vocab_hash
+    return artifacts
+
+
+# ------------------------------------------------------------
+# Dashboard KPI snapshot (page 3), written by dashboard_kpis.py
+# ------------------------------------------------------------
+def _load_business_kpis():
+    with open(business_kpis_path, "r") as f:
+        return json.load(f)
+
+
+def get_business_kpis():
+    return _get("business_kpis", [business_kpis_path], _load_business_kpis, _validate_kpis)
+
+
+# Sales cube written by build_sales_cube.py (None if it has not been built); shared read-only by all sessions
+def get_sales_cube():
+    return _get(
+        "sales_cube", [sales_cube_path],
+        _optional([sales_cube_path], lambda: pd.read_parquet(sales_cube_path)),
+        _validate_cube,
+    )
+
+
+# ------------------------------------------------------------
+# Serving store built by serving_store.py (None if it has not been published)
+# Single-key lookups (one customer, one product's neighbours) read from its pooled read-only
+# connections instead of the in-memory arrays; the store follows its own CURRENT pointer
+# ------------------------------------------------------------
+def get_serving_store():
+    return _get("serving_store", [serving_store_pointer], _optional([serving_store_pointer], ServingStore))
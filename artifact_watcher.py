@@ -0,0 +1,197 @@
+import os
+import queue
+import threading
+import time
+import traceback
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+# Wait this long after the last file event before reloading, so multi-file artifacts
+# (e.g. neighbour indices + scores) are picked up once, after the writer has finished
+debounce_seconds = 1.0
+
+
+# Version of a set of files: (mtime in ns, size) per path, None for missing files
+def file_version(*paths):
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+# ------------------------------------------------------------
+# Hot-swappable artifacts
+# Each artifact is registered with its files, a loader and an optional validator.
+# - get(name) only returns the current in-memory reference: requests never load new versions
+# - a watchdog observer reports file changes; a background thread waits for the writes to settle,
+#   loads the new version, validates it and swaps the reference in one assignment
+# - artifacts that index into each other (e.g. neighbour ids into the product vocabulary) are linked
+#   into a group: they are reloaded together, checked together against a group validator and swapped
+#   in one assignment; snapshot(names) returns all of them from the same swap
+# - if loading or validation fails, the previous version keeps serving and the error is logged
+# ------------------------------------------------------------
+class HotArtifacts:
+    def __init__(self, debounce=debounce_seconds):
+        self.debounce = debounce
+        self.specs = {}
+        # name -> value; replaced as a whole on every swap, never modified in place
+        self.current = {}
+        self.versions = {}
+        self.groups = {}
+        self.group_checks = {}
+        self.failed = {}
+        self.reloads = queue.Queue()
+        self.lock = threading.Lock()
+        self.observer = None
+        self.handler = None
+        self.watched = set()
+
+    # Load an artifact the first time it is requested and watch its files from then on
+    # Registering a name that already exists is a no-op; a failed first load raises and is retried next time
+    def register(self, name, paths, loader, validate=None):
+        with self.lock:
+            if name in self.specs:
+                return
+            paths = [os.path.abspath(p) for p in paths]
+            version = file_version(*paths)
+            value = loader()
+            if validate is not None and value is not None:
+                validate(value)
+            self.current = {**self.current, name: value}
+            self.versions[name] = version
+            self.specs[name] = (paths, loader, validate)
+            if self.observer is not None:
+                self._watch(paths)
+
+    # Link registered artifacts into a group checked by validate({name: value}) and swapped together
+    # Linking fails (and is retried on the next call) while the current versions do not fit together
+    def link(self, names, validate):
+        group = frozenset(names)
+        with self.lock:
+            if group in self.group_checks:
+                return
+            validate({name: self.current[name] for name in group})
+            for name in group:
+                self.groups[name] = group
+            self.group_checks[group] = validate
+
+    def get(self, name):
+        return self.current[name]
+
+    # Values of several artifacts taken from one swap (one read of the current mapping)
+    def snapshot(self, names):
+        current = self.current
+        return {name: current[name] for name in names}
+
+    def _reload(self, group):
+        names = sorted(group)
+        # Versions read before loading: a write that lands during the load triggers another reload
+        disk = {name: file_version(*self.specs[name][0]) for name in names}
+        changed = [name for name in names if disk[name] != self.versions[name]]
+        attempt = tuple(disk[name] for name in names)
+        if not changed or attempt == self.failed.get(group):
+            return
+
+        try:
+            candidate = dict(self.current)
+            for name in changed:
+                _, loader, validate = self.specs[name]
+                value = loader()
+                if validate is not None and value is not None:
+                    validate(value)
+                candidate[name] = value
+            if group in self.group_checks:
+                self.group_checks[group]({name: candidate[name] for name in group})
+        except Exception:
+            self.failed[group] = attempt
+            print(f"[artifact_watcher] Keeping previous {', '.join(names)}: new version failed to load or validate")
+            traceback.print_exc()
+            return
+
+        # One reference assignment: readers see either the old or the new group, never a mix
+        with self.lock:
+            self.current = {**self.current, **{name: candidate[name] for name in changed}}
+            for name in changed:
+                self.versions[name] = disk[name]
+        print(f"[artifact_watcher] Reloaded {', '.join(changed)}")
+
+    # Names of the artifacts that use a changed file
+    def _affected(self, path):
+        path = os.path.abspath(path)
+        return [name for name, (paths, _, _) in list(self.specs.items()) if path in paths]
+
+    def _reload_worker(self):
+        while True:
+            pending = {self.reloads.get()}
+            # Collect everything that changes while the writer is still busy
+            while True:
+                try:
+                    pending.add(self.reloads.get(timeout=self.debounce))
+                except queue.Empty:
+                    break
+            groups = {self.groups.get(name, frozenset([name])) for name in pending}
+            for group in sorted(groups, key=sorted):
+                self._reload(group)
+
+    # Watch the folder of every artifact file; folders that do not exist yet are covered
+    # by watching their closest existing parent recursively
+    def _watch(self, paths):
+        for path in paths:
+            folder, recursive = os.path.dirname(path), False
+            while not os.path.isdir(folder):
+                folder, recursive = os.path.dirname(folder), True
+            if (folder, recursive) not in self.watched and (folder, True) not in self.watched:
+                self.observer.schedule(self.handler, folder, recursive=recursive)
+                self.watched.add((folder, recursive))
+
+    def start(self):
+        artifacts = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for path in (event.src_path, getattr(event, "dest_path", "")):
+                    for name in artifacts._affected(path) if path else []:
+                        artifacts.reloads.put(name)
+
+        with self.lock:
+            self.handler = Handler()
+            self.observer = Observer()
+            self.observer.daemon = True
+            self.observer.start()
+            for paths, _, _ in self.specs.values():
+                self._watch(paths)
+
+        threading.Thread(target=self._reload_worker, name="artifact-reloader", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+
+
+if __name__ == "__main__":
+    from recommendation_core import load_neighbor_artifact
+
+    # Demo: watch the neighbour index and print its shape whenever a new version is swapped in
+    prefix = "models/product_neighbors"
+    artifacts = HotArtifacts().start()
+    artifacts.register(
+        "neighbors",
+        [f"{prefix}_indices.npy", f"{prefix}_scores.npy"],
+        lambda: load_neighbor_artifact(prefix),
+    )
+    print("Watching", prefix, "- re-run save_recommendation_data.py in another terminal (Ctrl+C to stop)")
+    try:
+        while True:
+            indices, _ = artifacts.get("neighbors")
+            print(time.strftime("%H:%M:%S"), "serving neighbours", indices.shape, "version", artifacts.versions["neighbors"][0])
+            time.sleep(5)
+    except KeyboardInterrupt:
+        artifacts.stop()
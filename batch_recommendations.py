@@ -0,0 +1,92 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from recommendation_core import load_neighbor_artifact, neighbor_matrix, recommend_batch
+from vocabulary import encode_products, load_product_names
+
+# Path to cleaned transaction dataset (used to build each customer's latest basket)
+clean_path = "data/online_retail_cleaned.parquet"
+
+# Optional list of newsletter products (one product description per line); all products if missing
+newsletter_products_path = "data/newsletter_products.txt"
+
+# Output files for the email campaign job
+similar_items_output_path = "data/newsletter_similar_items.csv"
+basket_output_path = "data/basket_recommendations.csv"
+
+# Number of recommendations per product / basket
+top_n = 5
+
+# ------------------------------------------------------------
+# Load the top-K neighbour index and the product id -> name table
+# The neighbour arrays become one sparse product x product matrix, so a whole batch is one matrix multiply
+# ------------------------------------------------------------
+neighbor_indices, neighbor_scores = load_neighbor_artifact("models/product_neighbors")
+product_names = load_product_names()
+item_matrix = neighbor_matrix(neighbor_indices, neighbor_scores)
+
+# ------------------------------------------------------------
+# 1. Similar items for every newsletter product
+# ------------------------------------------------------------
+if os.path.exists(newsletter_products_path):
+    with open(newsletter_products_path, "r") as f:
+        product_ids = encode_products([line for line in f if line.strip()], product_names)
+    # Unknown descriptions encode to -1 and are skipped
+    product_ids = product_ids[product_ids >= 0]
+else:
+    product_ids = np.arange(len(product_names), dtype=np.int32)
+
+start = time.perf_counter()
+rec_ids, rec_scores = recommend_batch(item_matrix, product_ids, top_n=top_n)
+print(f"Similar items for {len(product_ids)} products in {time.perf_counter() - start:.3f}s")
+
+
+# Product ids -> names only at the very end; -1 (no recommendation) becomes an empty string
+def to_names(ids):
+    return np.where(ids >= 0, product_names[np.maximum(ids, 0)], "")
+
+
+similar_items = pd.DataFrame({"Product": product_names[product_ids]})
+for rank in range(rec_ids.shape[1]):
+    similar_items[f"Recommendation_{rank + 1}"] = to_names(rec_ids[:, rank])
+
+# ------------------------------------------------------------
+# 2. "Complete your basket" recommendations from each customer's latest invoice
+# Products already in the basket are excluded automatically
+# ------------------------------------------------------------
+df = pd.read_parquet(clean_path, columns=["InvoiceNo", "InvoiceDate", "CustomerID", "Description"])
+df = df.dropna(subset=["CustomerID", "Description"])
+df["ProductID"] = encode_products(df["Description"], product_names)
+df = df[df["ProductID"] >= 0]
+
+latest_invoice = df.sort_values("InvoiceDate").groupby("CustomerID")["InvoiceNo"].last()
+latest = df[df["InvoiceNo"].isin(latest_invoice.values)]
+baskets = latest.groupby("InvoiceNo")["ProductID"].apply(lambda ids: ids.tolist())
+
+start = time.perf_counter()
+basket_ids, basket_scores = recommend_batch(item_matrix, list(baskets.values), top_n=top_n)
+print(f"Basket recommendations for {len(baskets)} baskets in {time.perf_counter() - start:.3f}s")
+
+invoice_customers = latest.drop_duplicates("InvoiceNo").set_index("InvoiceNo")["CustomerID"]
+basket_recs = pd.DataFrame({
+    "InvoiceNo": baskets.index,
+    "CustomerID": invoice_customers.loc[baskets.index].values,
+})
+for rank in range(basket_ids.shape[1]):
+    basket_recs[f"Recommendation_{rank + 1}"] = to_names(basket_ids[:, rank])
+
+similar_items.to_csv(similar_items_output_path, index=False)
+basket_recs.to_csv(basket_output_path, index=False)
+
+print("Saved:")
+print(similar_items_output_path)
+print(basket_output_path)
+
+# Q1. Why do we compute all campaign recommendations in one batch call instead of looping over products?
+# Answer: One sparse matrix multiply scores thousands of queries at once, instead of thousands of Python lookups.
+# This keeps the nightly email job fast even for large newsletters.
+
+# Q2. Why are basket items excluded from basket recommendations?
+# Answer: Customers already bought those products, so recommending them again wastes an email slot.
+# Excluding them focuses the campaign on genuine cross-sell opportunities.
@@ -0,0 +1,64 @@
+import time
+import tracemalloc
+import pandas as pd
+from recommendation_core import load_sparse_matrix
+from similarity_engines import SIMILARITY_ENGINES, build_engine_neighbors
+
+# Customer x product purchase matrix saved by save_recommendation_data.py
+purchases_path = "models/customer_purchases.npz"
+
+# Output file with the benchmark table
+output_path = "data/similarity_engine_benchmark.csv"
+
+# Neighbours kept per product (same as the production artifact) and the overlap depth reported
+top_k = 50
+top_n = 5
+
+interaction_matrix = load_sparse_matrix(purchases_path)
+print("Customer-Product Matrix Shape:", interaction_matrix.shape)
+
+# ------------------------------------------------------------
+# Build the top-K artifact with every engine, measuring wall time and peak Python/NumPy memory
+# tracemalloc sees NumPy buffers, so the peak includes the dense similarity blocks
+# ------------------------------------------------------------
+results = []
+neighbors = {}
+for engine in SIMILARITY_ENGINES:
+    tracemalloc.start()
+    start = time.perf_counter()
+    indices, scores = build_engine_neighbors(interaction_matrix, engine, top_k)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    neighbors[engine] = indices
+    results.append({
+        "Engine": engine,
+        "Build_Seconds": elapsed,
+        "Peak_Memory_MB": peak / 1024 ** 2,
+        "Artifact_MB": (indices.nbytes + scores.nbytes) / 1024 ** 2,
+        "Mean_Top1_Score": float(scores[:, 0].mean()),
+    })
+
+# ------------------------------------------------------------
+# How different are the engines? Top-5 overlap with the original quantity cosine engine
+# ------------------------------------------------------------
+baseline = neighbors["cosine"][:, :top_n]
+for row in results:
+    candidate = neighbors[row["Engine"]][:, :top_n]
+    overlap = (candidate[:, :, None] == baseline[:, None, :]).any(axis=2).mean()
+    row[f"Top{top_n}_Overlap_vs_Cosine"] = overlap
+
+benchmark = pd.DataFrame(results)
+print(benchmark.to_string(index=False))
+
+benchmark.to_csv(output_path, index=False)
+print("\nSaved:", output_path)
+
+# Q1. Why compare engines on the same top-K artifact format?
+# Answer: The app only reads neighbour ids and scores, so any engine can be swapped in without UI changes.
+# The benchmark then compares cost (time, memory) and behaviour (overlap) on equal terms.
+
+# Q2. Why would binarized or TF-IDF/BM25 similarity be preferred over raw-quantity cosine?
+# Answer: Raw quantities let a few wholesale orders decide what is "similar" for everybody.
+# Binarizing and IDF weighting focus on how many customers buy products together, not how many units.
@@ -0,0 +1,102 @@
+import itertools
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Input files: cleaned transactions and labeled customer segments
+clean_path = "data/online_retail_cleaned.parquet"
+segments_path = "data/customer_segments_labeled.csv"
+
+# Output cube read by the Business Insights page
+output_path = "data/sales_cube.parquet"
+
+# Cube dimensions and the label used for rolled-up ("any value") cells
+dimensions = ["Country", "Month", "Segment", "Category"]
+all_label = "All"
+
+
+# ------------------------------------------------------------
+# Product category = last word of the description (the product noun: MUG, LANTERN, BAG, ...)
+# The dataset has no category column, and the last word groups thousands of descriptions
+# into a few hundred categories that are meaningful for filtering
+# ------------------------------------------------------------
+def product_category(descriptions):
+    words = descriptions.astype(str).str.strip().str.upper().str.split().str[-1]
+    return words.fillna("OTHER")
+
+
+# ------------------------------------------------------------
+# Materialize every grouping set of the dimensions (2^4 = 16 groupbys, like SQL CUBE)
+# Rolled-up dimensions get the "All" label, so any filter combination is exactly one row
+# and each chart is one boolean mask. Distinct customers and invoices cannot be summed
+# across cells, which is why every rollup is computed from the transactions instead of
+# from the finest level.
+# ------------------------------------------------------------
+def build_cube(df, dimensions):
+    cells = []
+    for size in range(len(dimensions) + 1):
+        for group in itertools.combinations(dimensions, size):
+            if group:
+                grouped = df.groupby(list(group), observed=True, sort=False)
+                cell = grouped.agg(
+                    Revenue=("TotalPrice", "sum"),
+                    Quantity=("Quantity", "sum"),
+                    Invoices=("InvoiceNo", "nunique"),
+                    Customers=("CustomerID", "nunique"),
+                ).reset_index()
+            else:
+                cell = pd.DataFrame({
+                    "Revenue": [df["TotalPrice"].sum()],
+                    "Quantity": [df["Quantity"].sum()],
+                    "Invoices": [df["InvoiceNo"].nunique()],
+                    "Customers": [df["CustomerID"].nunique()],
+                })
+            for dimension in dimensions:
+                if dimension not in group:
+                    cell[dimension] = all_label
+                else:
+                    cell[dimension] = cell[dimension].astype(str)
+            cells.append(cell)
+
+    cube = pd.concat(cells, ignore_index=True)
+
+    # Compact columnar layout: dictionary-encoded dimensions, 32-bit counts (revenue stays float64 for exact totals)
+    for dimension in dimensions:
+        cube[dimension] = cube[dimension].astype("category")
+    cube = cube.astype({"Revenue": "float64", "Quantity": "int64", "Invoices": "int32", "Customers": "int32"})
+    return cube[dimensions + ["Revenue", "Quantity", "Invoices", "Customers"]]
+
+
+if __name__ == "__main__":
+    df = pd.read_parquet(clean_path, columns=[
+        "InvoiceNo", "Description", "Quantity", "InvoiceDate", "CustomerID", "Country", "TotalPrice"
+    ])
+    segments = pd.read_csv(segments_path, usecols=["CustomerID", "Segment"])
+
+    # Dimension columns as categoricals (small integer codes make the groupbys fast)
+    df["Month"] = pd.to_datetime(df["InvoiceDate"]).dt.strftime("%Y-%m")
+    df["Category"] = product_category(df["Description"])
+    df["Segment"] = df["CustomerID"].map(segments.set_index("CustomerID")["Segment"]).fillna("Unknown")
+    for column in dimensions + ["InvoiceNo"]:
+        df[column] = df[column].astype("category")
+    df["CustomerID"] = df["CustomerID"].astype(np.int64)
+
+    start = time.perf_counter()
+    cube = build_cube(df, dimensions)
+    print(f"Cube with {len(cube)} cells built in {time.perf_counter() - start:.2f}s")
+    print("Categories:", df["Category"].nunique(), "Countries:", df["Country"].nunique(), "Months:", df["Month"].nunique())
+
+    # Write to a temp file and rename, so the app never reads a half-written file
+    tmp_path = output_path + ".tmp"
+    cube.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+    print(f"Saved: {output_path} ({os.path.getsize(output_path) / 1024:.1f} KB)")
+
+# Q1. Why precompute a cube instead of grouping the transactions when a filter changes?
+# Answer: Grouping hundreds of thousands of rows on every click makes the dashboard slow.
+# With every filter combination precomputed, a selection is a lookup in a small table.
+
+# Q2. Why are rollups ("All") stored explicitly?
+# Answer: Revenue and quantity could be summed on the fly, but distinct customers and invoices cannot.
+# Storing each rollup keeps all four measures exact for every filter combination.
@@ -0,0 +1,197 @@
+import os
+import time
+import json
+import joblib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError
+from sklearn.cluster import KMeans
+from threadpoolctl import threadpool_limits
+
+# Path to the customer-level RFM table and the production segmentation artifacts
+rfm_path = "data/rfm_table.csv"
+scaler_path = "models/scaler.pkl"
+kmeans_path = "models/kmeans_model_k4.pkl"
+segment_map_path = "models/segment_map.json"
+
+# Output files with per-cluster stability and per-resample agreement scores
+stability_output_path = "data/cluster_stability.csv"
+bootstrap_output_path = "data/cluster_stability_bootstrap.csv"
+
+# Number of bootstrap resamples of the RFM matrix
+n_bootstrap = 100
+
+# Wall-clock budget for the whole analysis (resamples not started by then are cancelled)
+time_budget_seconds = 300
+
+# One worker per core; each worker keeps BLAS/OpenMP to a single thread so runtime scales with cores
+n_workers = os.cpu_count() or 1
+
+# Clusters with mean Jaccard agreement at or above this value are treated as stable (Hennig, 2007)
+stable_threshold = 0.75
+
+# Scaled RFM matrix shared by every task in a worker process (set once by the pool initializer)
+_worker_X = None
+
+
+def _init_worker(X_scaled):
+    global _worker_X
+    _worker_X = X_scaled
+    # Avoid oversubscription: parallelism comes from the process pool, not from threads inside KMeans
+    threadpool_limits(1)
+
+
+# ------------------------------------------------------------
+# Fit KMeans on one bootstrap resample and label every customer with it
+# The seed drives both the resample and the KMeans initialisation, so each run is reproducible
+# ------------------------------------------------------------
+def _fit_bootstrap(seed, n_clusters):
+    rng = np.random.default_rng(seed)
+    sample_idx = rng.integers(0, _worker_X.shape[0], size=_worker_X.shape[0])
+
+    model = KMeans(n_clusters=n_clusters, random_state=seed, n_init=10)
+    model.fit(_worker_X[sample_idx])
+
+    return seed, model.predict(_worker_X).astype(np.int32)
+
+
+# ------------------------------------------------------------
+# Agreement between the production labels and every bootstrap labelling at once
+# One np.bincount on the combined (resample, reference, bootstrap) label gives all contingency tables
+# as a (resamples x k x k) array; ARI and clusterwise Jaccard are then array operations on it
+# Each production cluster is matched to its best-overlapping bootstrap cluster
+# ------------------------------------------------------------
+def _pairs(counts):
+    return counts * (counts - 1) / 2
+
+
+def agreement_scores(reference_labels, bootstrap_labels, n_clusters):
+    n_resamples, n_customers = bootstrap_labels.shape
+    combined = (
+        np.arange(n_resamples, dtype=np.int64)[:, None] * n_clusters * n_clusters
+        + reference_labels.astype(np.int64)[None, :] * n_clusters
+        + bootstrap_labels
+    )
+    contingency = np.bincount(combined.ravel(), minlength=n_resamples * n_clusters * n_clusters)
+    contingency = contingency.reshape(n_resamples, n_clusters, n_clusters).astype(np.float64)
+
+    ref_sizes = contingency.sum(axis=2)
+    boot_sizes = contingency.sum(axis=1)
+
+    # Adjusted Rand Index from the pair counts of each table (same formula as sklearn)
+    index = _pairs(contingency).sum(axis=(1, 2))
+    sum_ref = _pairs(ref_sizes).sum(axis=1)
+    sum_boot = _pairs(boot_sizes).sum(axis=1)
+    expected = sum_ref * sum_boot / _pairs(n_customers)
+    maximum = (sum_ref + sum_boot) / 2
+    denominator = maximum - expected
+    ari = np.divide(index - expected, denominator, out=np.ones(n_resamples), where=denominator != 0)
+
+    union = ref_sizes[:, :, None] + boot_sizes[:, None, :] - contingency
+    jaccard = np.divide(contingency, union, out=np.zeros(contingency.shape), where=union > 0)
+    return ari, jaccard.max(axis=2)
+
+
+# ------------------------------------------------------------
+# Run the bootstrap resamples in a process pool within the time budget
+# Returns a list of (seed, labels) for every resample that finished in time
+# ------------------------------------------------------------
+def run_bootstrap(X_scaled, n_clusters, n_resamples, workers, budget_seconds, base_seed=42):
+    deadline = time.monotonic() + budget_seconds
+    results = []
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(X_scaled,)
+    )
+    futures = [
+        executor.submit(_fit_bootstrap, base_seed + b, n_clusters)
+        for b in range(n_resamples)
+    ]
+
+    try:
+        for future in as_completed(futures, timeout=budget_seconds):
+            results.append(future.result())
+            if time.monotonic() >= deadline:
+                break
+    except TimeoutError:
+        pass
+    finally:
+        # Drop resamples that have not started; only the few already running are waited on
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return sorted(results, key=lambda r: r[0])
+
+
+if __name__ == "__main__":
+    # Load RFM features and scale them exactly like the production model
+    rfm = pd.read_csv(rfm_path)
+    X = rfm[["Recency", "Frequency", "Monetary"]]
+
+    scaler = joblib.load(scaler_path)
+    kmeans = joblib.load(kmeans_path)
+    X_scaled = np.ascontiguousarray(scaler.transform(X))
+
+    with open(segment_map_path, "r") as f:
+        segment_map = {int(k): v for k, v in json.load(f).items()}
+
+    n_clusters = kmeans.n_clusters
+    reference_labels = kmeans.predict(X_scaled).astype(np.int32)
+
+    print(f"Running {n_bootstrap} bootstrap resamples on {n_workers} worker(s), budget {time_budget_seconds}s...")
+    start = time.perf_counter()
+    results = run_bootstrap(X_scaled, n_clusters, n_bootstrap, n_workers, time_budget_seconds)
+    elapsed = time.perf_counter() - start
+    print(f"Completed {len(results)}/{n_bootstrap} resamples in {elapsed:.1f}s")
+
+    if not results:
+        raise SystemExit("No bootstrap resample finished within the time budget.")
+
+    # Stack all bootstrap labellings so agreement is computed for every resample in one pass
+    seeds = np.array([seed for seed, _ in results])
+    labels = np.vstack([lab for _, lab in results])
+
+    ari, jaccard = agreement_scores(reference_labels, labels, n_clusters)
+
+    # ------------------------------------------------------------
+    # Per-cluster stability summary
+    # Mean Jaccard >= 0.75 means the segment is reproduced reliably across resamples
+    # ------------------------------------------------------------
+    stability = pd.DataFrame({
+        "Cluster": np.arange(n_clusters),
+        "Segment": [segment_map.get(c, "Unknown") for c in range(n_clusters)],
+        "Customers": np.bincount(reference_labels, minlength=n_clusters),
+        "Mean_Jaccard": jaccard.mean(axis=0),
+        "P05_Jaccard": np.percentile(jaccard, 5, axis=0),
+        "Min_Jaccard": jaccard.min(axis=0),
+    })
+    stability["Stable"] = stability["Mean_Jaccard"] >= stable_threshold
+
+    bootstrap_scores = pd.DataFrame({"Seed": seeds, "ARI": ari})
+    for c in range(n_clusters):
+        bootstrap_scores[f"Jaccard_{c}"] = jaccard[:, c]
+
+    print("\nAdjusted Rand Index vs production model:")
+    print(f"Mean: {ari.mean():.3f}  Std: {ari.std():.3f}  Min: {ari.min():.3f}")
+    print("\nPer-cluster stability:")
+    print(stability)
+
+    stability.to_csv(stability_output_path, index=False)
+    bootstrap_scores.to_csv(bootstrap_output_path, index=False)
+
+    print("\nSaved:")
+    print(stability_output_path)
+    print(bootstrap_output_path)
+
+# Q1. Why do we fit KMeans on bootstrap resamples instead of just changing the random seed?
+# Answer: Resampling customers tests whether the segments depend on the particular customers in the data.
+# A segment that survives resampling reflects a real behavioural group, not an artefact of one sample.
+
+# Q2. Why do we report clusterwise Jaccard in addition to the Adjusted Rand Index?
+# Answer: ARI summarises the whole partition, so one unstable segment can hide behind three stable ones.
+# Per-cluster Jaccard shows exactly which segment (e.g. the small High Value group) is fragile.
+
+# Q3. Why do we limit each worker to one BLAS/OpenMP thread?
+# Answer: The process pool already uses every core, so extra threads inside KMeans would fight for the same cores.
+# One thread per worker keeps runtime scaling close to linear with the number of cores.
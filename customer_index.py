@@ -0,0 +1,103 @@
+import glob
+import json
+import os
+import shutil
+from datetime import datetime
+import numpy as np
+from recommendation_core import save_array
+
+# On-disk customer lookup index (one .npy file per column, memory-mapped by the app and the service)
+# customer_ids.npy: sorted CustomerID values (int32); rfm.npy: Recency, Frequency, Monetary per row (float64);
+# clusters.npy: KMeans cluster per row (int8); segment labels come from segment_map.json
+# Every build is written to its own version folder and the CURRENT pointer file names the live one
+customer_index_dir = "models/customer_index"
+current_pointer = "CURRENT"
+segment_map_path = "models/segment_map.json"
+
+# Published versions kept on disk (readers may still have an older version mapped)
+keep_versions = 2
+
+rfm_columns = ["Recency", "Frequency", "Monetary"]
+
+
+# ------------------------------------------------------------
+# Build the index from the labeled customer table (CustomerID, Recency, Frequency, Monetary, Cluster)
+# Rows are sorted by CustomerID, so a lookup is one binary search (np.searchsorted, O(log n))
+# ------------------------------------------------------------
+def build_customer_index(customers):
+    order = np.argsort(customers["CustomerID"].to_numpy(), kind="stable")
+    return {
+        "customer_ids": customers["CustomerID"].to_numpy()[order].astype(np.int32),
+        "rfm": customers[rfm_columns].to_numpy(dtype=np.float64)[order],
+        "clusters": customers["Cluster"].to_numpy()[order].astype(np.int8),
+    }
+
+
+# ------------------------------------------------------------
+# Save the three columns as one set: write a new version folder, then replace CURRENT with os.replace
+# (atomic rename), so readers see either the old or the new columns, never a mix
+# ------------------------------------------------------------
+def save_customer_index(index, path=customer_index_dir):
+    version = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    version_dir = os.path.join(path, f"index_{version}")
+    os.makedirs(version_dir)
+    for name, array in index.items():
+        save_array(os.path.join(version_dir, f"{name}.npy"), array)
+
+    tmp_pointer = os.path.join(path, current_pointer + ".tmp")
+    with open(tmp_pointer, "w") as f:
+        f.write(os.path.basename(version_dir))
+    os.replace(tmp_pointer, os.path.join(path, current_pointer))
+
+    for old in sorted(glob.glob(os.path.join(path, "index_*")))[:-keep_versions]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+# Folder of the published version, or None if no index has been saved yet
+def current_index_dir(path=customer_index_dir):
+    try:
+        with open(os.path.join(path, current_pointer), "r") as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def load_customer_index(path=customer_index_dir, mmap_mode="r"):
+    version_dir = current_index_dir(path)
+    if version_dir is None:
+        raise FileNotFoundError(f"No customer index published in {path}")
+    index = {
+        name: np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in ["customer_ids", "rfm", "clusters"]
+    }
+    with open(segment_map_path, "r") as f:
+        index["segment_map"] = {int(k): v for k, v in json.load(f).items()}
+    return index
+
+
+# ------------------------------------------------------------
+# Vectorized lookup of many customers: row positions in the index (-1 = unknown customer)
+# ------------------------------------------------------------
+def find_customers(index, customer_ids):
+    ids = index["customer_ids"]
+    values = np.asarray(customer_ids, dtype=np.int64)
+    if len(ids) == 0:
+        return np.full(len(values), -1, dtype=np.int64)
+    positions = np.minimum(np.searchsorted(ids, values), len(ids) - 1)
+    return np.where(ids[positions] == values, positions, -1)
+
+
+# Record of one customer row: CustomerID, RFM values, cluster and segment label
+def customer_record(index, row):
+    cluster = int(index["clusters"][row])
+    record = {"CustomerID": int(index["customer_ids"][row])}
+    record.update({column: float(value) for column, value in zip(rfm_columns, index["rfm"][row])})
+    record["Cluster"] = cluster
+    record["Segment"] = index["segment_map"].get(cluster, "Unknown")
+    return record
+
+
+# Single customer lookup; returns None for an unknown CustomerID
+def lookup_customer(index, customer_id):
+    row = find_customers(index, [customer_id])[0]
+    return None if row < 0 else customer_record(index, row)
@@ -0,0 +1,67 @@
+import time
+from recommendation_core import (
+    load_neighbor_artifact,
+    load_sparse_matrix,
+    neighbor_matrix,
+    recommend_for_customer,
+    recommend_for_customers,
+    save_array,
+)
+from vocabulary import load_customer_ids, load_product_names
+
+# Output file with the nightly top-N products per customer (rows aligned with models/customer_ids.npy)
+output_path = "models/customer_recommendations.npy"
+
+# Number of recommendations precomputed per customer
+top_n = 10
+
+# Memory bound for the dense blocks of customers scored across all worker threads
+block_memory_mb = 256
+
+# ------------------------------------------------------------
+# Load the saved purchase matrix, id vocabularies and top-K neighbour index
+# ------------------------------------------------------------
+purchase_matrix = load_sparse_matrix("models/customer_purchases.npz")
+customer_ids = load_customer_ids()
+neighbor_indices, neighbor_scores = load_neighbor_artifact("models/product_neighbors")
+product_names = load_product_names()
+
+item_matrix = neighbor_matrix(neighbor_indices, neighbor_scores)
+print("Customers:", purchase_matrix.shape[0], "Products:", purchase_matrix.shape[1])
+
+# ------------------------------------------------------------
+# Nightly batch: score every customer in parallel blocks
+# Each customer's purchase vector is multiplied by the sparse neighbour matrix and purchased items are removed
+# ------------------------------------------------------------
+start = time.perf_counter()
+rec_ids, rec_scores = recommend_for_customers(
+    purchase_matrix,
+    item_matrix,
+    top_n=top_n,
+    block_memory_mb=block_memory_mb
+)
+print(f"Recommendations for {len(customer_ids)} customers in {time.perf_counter() - start:.3f}s")
+
+save_array(output_path, rec_ids)
+
+# ------------------------------------------------------------
+# On-demand path for a single customer (same scoring as the batch job)
+# ------------------------------------------------------------
+example_customer = customer_ids[0]
+example = recommend_for_customer(example_customer, customer_ids, purchase_matrix, item_matrix, top_n=5)
+print("\nExample Customer:", example_customer)
+if example is None:
+    print("No purchase history for this customer.")
+else:
+    print("Top 5 Recommendations:", list(product_names[example[0]]))
+
+print("\nSaved:")
+print(output_path)
+
+# Q1. Why do we multiply the purchase vector by the item-neighbour matrix?
+# Answer: Every purchased product votes for its most similar products, weighted by similarity.
+# Summing those votes gives products that fit the customer's whole history, not just one item.
+
+# Q2. Why precompute recommendations nightly instead of only on demand?
+# Answer: Email and CRM campaigns need recommendations for every customer at once.
+# Precomputing in parallel blocks makes those lookups instant, while the on-demand path covers new activity.
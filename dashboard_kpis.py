@@ -0,0 +1,45 @@
+import json
+import os
+import pandas as pd
+
+# Input files: cleaned transactions and labeled customer segments
+clean_path = "data/online_retail_cleaned.parquet"
+segments_path = "data/customer_segments_labeled.csv"
+
+# Output file read by the Business Insights page (a few bytes, independent of transaction volume)
+output_path = "data/business_kpis.json"
+
+# Load only the columns the KPIs need
+df = pd.read_parquet(clean_path, columns=["InvoiceNo", "Description", "TotalPrice"])
+segments = pd.read_csv(segments_path, usecols=["CustomerID", "Segment"])
+
+# ------------------------------------------------------------
+# Dashboard KPIs and segment distribution, computed once at build time
+# Same definitions as the dashboard used before (customers from the labeled segments file)
+# ------------------------------------------------------------
+segment_counts = segments["Segment"].value_counts()
+kpis = {
+    "total_customers": int(segments["CustomerID"].nunique()),
+    "total_transactions": int(df["InvoiceNo"].nunique()),
+    "total_products": int(df["Description"].nunique()),
+    "total_revenue": float(df["TotalPrice"].sum()),
+    "segment_counts": {segment: int(count) for segment, count in segment_counts.items()},
+    "built_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+}
+
+# Write to a temp file and rename, so the app never reads a half-written file
+tmp_path = output_path + ".tmp"
+with open(tmp_path, "w") as f:
+    json.dump(kpis, f, indent=2)
+os.replace(tmp_path, output_path)
+
+print(json.dumps(kpis, indent=2))
+print("Saved:", output_path)
+
+# Q1. Why precompute the dashboard KPIs instead of calculating them in Streamlit?
+# Answer: Counting unique invoices and products scans every transaction, which gets slower as data grows.
+# A small snapshot makes the dashboard render in constant time, no matter how many transactions exist.
+
+# Q2. When should this script be run?
+# Answer: After clean_data.py and segment_labeling.py, whenever the data or segments are rebuilt.
+# The app picks up the new snapshot automatically on the next page interaction.
@@ -0,0 +1,188 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from scipy import sparse
+from recommendation_core import interaction_matrix_from_ids, neighbor_matrix, recommend_for_customers
+from similarity_engines import SIMILARITY_ENGINES, build_engine_neighbors
+from vocabulary import build_vocabulary, encode_customers, encode_products
+
+# Path to cleaned transaction dataset
+clean_path = "data/online_retail_cleaned.parquet"
+
+# Output file with one row of metrics per engine and evaluation level
+output_path = "data/recommendation_evaluation.csv"
+
+# Transactions in the last holdout_days are held out; everything before is used for training
+holdout_days = 60
+
+# Cut-off for the ranking metrics and neighbours kept per product
+k = 10
+top_k = 50
+
+# Rows per metric chunk and worker threads (None = all CPU cores)
+chunk_rows = 4096
+n_jobs = None
+
+
+# ------------------------------------------------------------
+# Hit-rate@k, recall@k and NDCG@k for every row at once
+# recommended: (n_rows x k) product ids (-1 = empty slot), truth: sparse rows x products (1 = relevant)
+# Hits are gathered from the sparse truth matrix with one fancy-index lookup per chunk,
+# and chunks are scored in parallel threads; only the per-chunk sums are combined
+# ------------------------------------------------------------
+def _chunk_metric_sums(recommended, truth, k):
+    n_rows = recommended.shape[0]
+    cols = recommended[:, :k].ravel()
+    rows = np.repeat(np.arange(n_rows), k)
+    valid = cols >= 0
+
+    hits = np.zeros(n_rows * k)
+    hits[valid] = np.asarray(truth[rows[valid], cols[valid]]).ravel()
+    hits = hits.reshape(n_rows, k)
+
+    n_relevant = np.diff(truth.indptr)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    ideal_dcg = np.cumsum(discounts)[np.minimum(n_relevant, k) - 1]
+
+    return np.array([
+        (hits.sum(axis=1) > 0).sum(),
+        (hits.sum(axis=1) / n_relevant).sum(),
+        (hits @ discounts / ideal_dcg).sum(),
+    ])
+
+
+def ranking_metrics(recommended, truth, k):
+    n_rows = recommended.shape[0]
+
+    def score_chunk(start):
+        stop = min(start + chunk_rows, n_rows)
+        return _chunk_metric_sums(recommended[start:stop], truth[start:stop], k)
+
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count() or 1) as executor:
+        totals = sum(executor.map(score_chunk, range(0, n_rows, chunk_rows)))
+
+    hit_rate, recall, ndcg = totals / n_rows
+    recommended_ids = recommended[:, :k]
+    return {
+        "Rows_Evaluated": n_rows,
+        f"HitRate@{k}": hit_rate,
+        f"Recall@{k}": recall,
+        f"NDCG@{k}": ndcg,
+        "Catalog_Coverage": len(np.unique(recommended_ids[recommended_ids >= 0])) / truth.shape[1],
+    }
+
+
+# Top-k most popular products per row, skipping the products marked in the sparse exclude matrix
+def popular_top_k(popularity, exclude, k):
+    top = np.empty((exclude.shape[0], k), dtype=np.int32)
+    for start in range(0, exclude.shape[0], chunk_rows):
+        scores = np.tile(popularity, (min(chunk_rows, exclude.shape[0] - start), 1))
+        scores[exclude[start:start + chunk_rows].nonzero()] = -np.inf
+        candidates = np.argpartition(-scores, k, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+        top[start:start + chunk_rows] = np.take_along_axis(candidates, order, axis=1)
+    return top
+
+
+# Binary sparse matrix with only the rows that have at least one relevant product
+def relevant_rows(matrix):
+    matrix = sparse.csr_matrix(matrix > 0, dtype=np.float64)
+    rows = np.flatnonzero(np.diff(matrix.indptr) > 0)
+    return rows, matrix[rows]
+
+
+df = pd.read_parquet(clean_path, columns=["CustomerID", "StockCode", "Description", "Quantity", "InvoiceDate"])
+df = df.dropna(subset=["CustomerID", "Description"])
+df["InvoiceDate"] = pd.to_datetime(df["InvoiceDate"])
+
+# ------------------------------------------------------------
+# Time-based split: train on the past, evaluate on what customers bought afterwards
+# ------------------------------------------------------------
+cutoff = df["InvoiceDate"].max() - pd.Timedelta(days=holdout_days)
+train = df[df["InvoiceDate"] <= cutoff]
+holdout = df[df["InvoiceDate"] > cutoff]
+print(f"Train rows: {len(train)}, holdout rows: {len(holdout)} (cut-off {cutoff.date()})")
+
+products, customer_ids = build_vocabulary(train)
+product_names = products["Description"].to_numpy(dtype=object)
+shape = (len(customer_ids), len(product_names))
+
+train_matrix = interaction_matrix_from_ids(
+    encode_customers(train["CustomerID"], customer_ids),
+    encode_products(train["Description"], product_names),
+    train["Quantity"],
+    shape=shape
+)
+train_bought = sparse.csr_matrix(train_matrix > 0, dtype=np.float64)
+
+# ------------------------------------------------------------
+# Ground truth: holdout purchases of known customers and products that were not already bought in train
+# Customers evaluated = customers with at least one such new product
+# ------------------------------------------------------------
+holdout_customers = encode_customers(holdout["CustomerID"], customer_ids)
+holdout_products = encode_products(holdout["Description"], product_names)
+known = (holdout_customers >= 0) & (holdout_products >= 0)
+holdout_matrix = sparse.csr_matrix(
+    (np.ones(known.sum()), (holdout_customers[known], holdout_products[known])),
+    shape=shape
+)
+new_purchases = holdout_matrix > 0
+new_purchases = new_purchases - new_purchases.multiply(train_bought > 0)
+eval_customers, customer_truth = relevant_rows(new_purchases)
+print("Customers evaluated:", len(eval_customers))
+
+# ------------------------------------------------------------
+# Product-level ground truth: for product p, the new holdout purchases of customers who bought p in train
+# (train_bought^T @ new_purchases, self pairs removed); products without such purchases are skipped
+# ------------------------------------------------------------
+product_truth = (train_bought.T @ sparse.csr_matrix(new_purchases, dtype=np.float64)).tolil()
+product_truth.setdiag(0)
+eval_products, product_truth = relevant_rows(product_truth.tocsr())
+print("Products evaluated:", len(eval_products))
+
+results = []
+
+# ------------------------------------------------------------
+# Baseline: most popular products (by number of buyers in train), excluding the customer's own purchases
+# or, at product level, the query product itself
+# ------------------------------------------------------------
+start = time.perf_counter()
+popularity = np.diff(train_bought.tocsc().indptr).astype(np.float32)
+popular_customers = popular_top_k(popularity, train_bought[eval_customers], k)
+popular_products = popular_top_k(popularity, sparse.identity(len(product_names), format="csr")[eval_products], k)
+elapsed = time.perf_counter() - start
+results.append({"Engine": "popularity", "Level": "customer", "Seconds": elapsed, **ranking_metrics(popular_customers, customer_truth, k)})
+results.append({"Engine": "popularity", "Level": "product", "Seconds": elapsed, **ranking_metrics(popular_products, product_truth, k)})
+
+# ------------------------------------------------------------
+# Every similarity engine: build the neighbour artifact on train only, then score all customers
+# (purchase vector x neighbour matrix in parallel blocks) and all products (their top-k neighbours)
+# ------------------------------------------------------------
+for engine in SIMILARITY_ENGINES:
+    start = time.perf_counter()
+    indices, scores = build_engine_neighbors(train_matrix, engine, top_k)
+    recommended, _ = recommend_for_customers(train_matrix, neighbor_matrix(indices, scores), eval_customers, top_n=k)
+    elapsed = time.perf_counter() - start
+
+    results.append({"Engine": engine, "Level": "customer", "Seconds": elapsed, **ranking_metrics(recommended, customer_truth, k)})
+    results.append({"Engine": engine, "Level": "product", "Seconds": elapsed, **ranking_metrics(indices[eval_products], product_truth, k)})
+
+evaluation = pd.DataFrame(results).sort_values(["Level", f"NDCG@{k}"], ascending=[True, False])
+print(evaluation.to_string(index=False))
+
+evaluation.to_csv(output_path, index=False)
+print("\nSaved:", output_path)
+
+# Q1. Why split transactions by time instead of randomly?
+# Answer: In production we always recommend from past behaviour to future purchases.
+# A time split reproduces that setting, so the metrics reflect real predictive value, not similarity scores.
+
+# Q2. Why include a popularity baseline?
+# Answer: Recommending best-sellers is easy and often strong; an engine is only useful if it beats it.
+# It also makes the metric values interpretable for business stakeholders.
+
+# Q3. Why evaluate at customer and product level?
+# Answer: The customer level matches the nightly email job (whole purchase history as the query).
+# The product level matches the app page, where one product is the query and its neighbours are shown.
@@ -1,11 +1,16 @@
-import joblib
 import numpy as np
-import pandas as pd
 from scipy.stats import mannwhitneyu
+from sklearn.preprocessing import normalize
+from recommendation_core import load_neighbor_artifact, load_sparse_matrix
 
-# Load similarity matrix and product list
-product_similarity_df = joblib.load("models/product_similarity.pkl")
-product_list = joblib.load("models/product_list.pkl")
+# Load top-K neighbour index (rows = product ids)
+neighbor_indices, neighbor_scores = load_neighbor_artifact("models/product_neighbors")
+n_products = neighbor_indices.shape[0]
+
+# The neighbour index only stores the best matches, so random-pair similarities are
+# computed from L2-normalised product vectors (cosine = dot product of unit vectors)
+purchase_matrix = load_sparse_matrix("models/customer_purchases.npz")
+item_vectors = normalize(purchase_matrix.T.tocsr())
 
 np.random.seed(42)
 
@@ -18,22 +23,17 @@ random_scores = []
 print("Running hypothesis test on recommendation similarity...\n")
 
 # Pick random sample of products to evaluate
-sample_products = np.random.choice(product_list, size=min(num_trials, len(product_list)), replace=False)
+sample_products = np.random.choice(n_products, size=min(num_trials, n_products), replace=False)
 
 for product in sample_products:
-    # Get similarity scores for the chosen product
-    sim_scores = product_similarity_df[product].sort_values(ascending=False)
-
-    # Remove self-similarity
-    sim_scores = sim_scores.drop(product)
-
-    # Top 5 recommendation similarities
-    top5 = sim_scores.head(top_n).values
+    # Top 5 recommendation similarities (neighbours are stored best-first, self excluded)
+    top5 = neighbor_scores[product, :top_n]
     top5_scores.extend(top5)
 
-    # Random 5 product similarities (baseline)
-    random_items = np.random.choice(sim_scores.index, size=top_n, replace=False)
-    random_vals = sim_scores.loc[random_items].values
+    # Random 5 product similarities (baseline), excluding the product itself
+    candidates = np.delete(np.arange(n_products), product)
+    random_items = np.random.choice(candidates, size=top_n, replace=False)
+    random_vals = item_vectors[random_items].dot(item_vectors[product].T).toarray().ravel()
     random_scores.extend(random_vals)
 
 top5_scores = np.array(top5_scores)
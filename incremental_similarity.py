@@ -0,0 +1,467 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from ann_index import ann_index_path, load_ivf_index, pad_ivf_index, save_ivf_index
+from product_search import build_search_index, save_search_index
+from recommendation_core import (
+    block_rows_for,
+    interaction_matrix_from_ids,
+    load_artifact_info,
+    save_artifact_info,
+    save_neighbor_artifact,
+    save_array,
+    save_sparse_matrix,
+    load_sparse_matrix,
+    select_top_n,
+)
+from vocabulary import (
+    build_vocabulary,
+    customer_vocab_path,
+    encode_customers,
+    encode_products,
+    load_customer_ids,
+    load_product_vocab,
+    product_vocab_path,
+    save_vocabulary,
+    vocabulary_hash,
+)
+
+# Path to cleaned transaction dataset (used to initialise the state on the first run)
+clean_path = "data/online_retail_cleaned.parquet"
+
+# New invoices to fold into the similarity state (same columns as the cleaned dataset)
+new_transactions_path = "data/new_transactions.parquet"
+
+# Folder holding the incremental similarity state between runs
+state_dir = "models/similarity_state"
+
+# Published neighbour index; its _info.json holds the engine and score dtype of the last full build
+neighbors_prefix = "models/product_neighbors"
+
+# Number of most similar products kept per product (same as save_recommendation_data.py)
+top_k = 50
+
+# Extra candidates kept in the state beyond top_k (only the first top_k are published), so a list whose
+# scores drop can usually be re-sorted in place instead of recomputed
+extra_candidates = 25
+
+# Memory bound for each dense block of similarity rows recomputed during a refresh
+block_memory_mb = 256
+
+# Product-aligned artifacts written by the other pipeline scripts: (path, product axis, value for new products)
+# New products are appended to all of them in the same publish as the neighbour index and the vocabulary,
+# so every product id in product_vocab.parquet is a valid row everywhere (no purchases / neighbours yet)
+purchases_path = "models/customer_purchases.npz"
+product_aligned_arrays = [
+    ("models/product_bought_together_indices.npy", 0, -1),
+    ("models/product_bought_together_scores.npy", 0, 0),
+    ("models/product_bought_together_scale.npy", 0, 1),
+    ("models/segment_neighbors_indices.npy", 1, -1),
+    ("models/segment_neighbors_scores.npy", 1, 0),
+    ("models/segment_popularity.npy", 1, 0),
+    ("models/product_embeddings.npy", 0, 0),
+]
+
+# Artifacts among them that record the vocabulary they were built against: (prefix, product axis)
+product_aligned_prefixes = [("models/product_bought_together", 0), ("models/segment_neighbors", 1)]
+
+
+# ------------------------------------------------------------
+# Incremental similarity state
+# purchases = customer x product quantities (sparse), gram = product x product dot products X^T X (sparse)
+# norms = product vector lengths, so cosine(i, j) = gram[i, j] / (norms[i] * norms[j])
+# Both matrices are a compacted CSR base plus a LIL matrix of pending changes: a batch only writes the
+# entries it changes into the LIL part, and reads of a few rows add the two (see current_rows).
+# The pending changes are merged into the base once, when the state is saved.
+# indices / scores hold top_k + extra_candidates candidates per product; bounds[i] is an upper bound on the
+# score of every product outside row i's list (its last score when the list was computed)
+# Customers and products keep their ids forever; new ones are appended at the end
+# ------------------------------------------------------------
+def init_state(interaction_matrix, customer_ids, products, k=top_k + extra_candidates):
+    purchases = sparse.csr_matrix(interaction_matrix, dtype=np.float64)
+    gram = (purchases.T @ purchases).tocsr()
+    n_items = purchases.shape[1]
+
+    state = {
+        "purchases": purchases,
+        "purchases_pending": sparse.lil_matrix(purchases.shape, dtype=np.float64),
+        "gram": gram,
+        "gram_pending": sparse.lil_matrix(gram.shape, dtype=np.float64),
+        "norms": np.sqrt(gram.diagonal()),
+        "customer_ids": list(customer_ids),
+        "customer_index": {c: i for i, c in enumerate(customer_ids)},
+        "product_names": list(products["Description"]),
+        "stock_codes": list(products["StockCode"]),
+        "product_index": {p: i for i, p in enumerate(products["Description"])},
+        "indices": np.full((n_items, k), -1, dtype=np.int32),
+        "scores": np.zeros((n_items, k), dtype=np.float32),
+        "bounds": np.zeros(n_items, dtype=np.float32),
+    }
+    refresh_neighbors(state, np.arange(n_items))
+    return state
+
+
+# Bound on the scores outside each list: its last score, or -inf when the list holds every other product
+def list_bounds(indices, scores):
+    return np.where(indices[:, -1] >= 0, scores[:, -1], -np.inf).astype(np.float32)
+
+
+# Current values of some rows of "purchases" or "gram": compacted base + pending changes (CSR)
+def current_rows(state, name, rows):
+    return (state[name][rows] + state[name + "_pending"][rows].tocsr()).tocsr()
+
+
+# Add sparse changes into a pending LIL matrix; only the changed entries are touched
+def add_pending(pending, changes):
+    changes = changes.tocoo()
+    changes.sum_duplicates()
+    if changes.nnz:
+        pending[changes.row, changes.col] = pending[changes.row, changes.col].toarray().ravel() + changes.data
+
+
+# Grow the base and pending matrices of "purchases" or "gram" to a new shape (new ids at the end)
+def resize_matrix(state, name, shape):
+    if state[name].shape != shape:
+        state[name].resize(shape)
+        state[name + "_pending"].resize(shape)
+
+
+# Merge the pending changes into the CSR base (O(nnz), done once per saved state)
+def compact_state(state):
+    for name in ["purchases", "gram"]:
+        state[name] = (state[name] + state[name + "_pending"].tocsr()).tocsr()
+        state[name + "_pending"] = sparse.lil_matrix(state[name].shape, dtype=np.float64)
+
+
+# ------------------------------------------------------------
+# Recompute the top-K lists of the given product rows from the sparse Gram matrix
+# Rows are processed in blocks so memory stays bounded by block_memory_mb
+# ------------------------------------------------------------
+def refresh_neighbors(state, rows, block_memory_mb=block_memory_mb):
+    norms = state["norms"]
+    n_items = state["gram"].shape[0]
+    k = state["indices"].shape[1]
+    block_rows = block_rows_for(n_items, block_memory_mb, 1)
+
+    # Zero vectors have no similarity to anything; avoid dividing by zero
+    inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    for start in range(0, len(rows), block_rows):
+        block_ids = rows[start:start + block_rows]
+        block = current_rows(state, "gram", block_ids).toarray()
+        block *= inverse_norms[block_ids, None]
+        block *= inverse_norms[None, :]
+
+        indices, scores = select_top_n(block, k, exclude=block_ids)
+        width = indices.shape[1]
+        state["indices"][block_ids] = -1
+        state["scores"][block_ids] = 0.0
+        state["indices"][block_ids, :width] = indices
+        state["scores"][block_ids, :width] = scores
+        state["bounds"][block_ids] = list_bounds(state["indices"][block_ids], state["scores"][block_ids])
+
+
+# ------------------------------------------------------------
+# Update lists whose own dot products did not change, but which contain products whose norm grew
+# Their scores are rescaled in place (old norm / new norm) and the list re-sorted. The norms of the
+# other products did not shrink, so scores outside the list are still at most bounds[row]: the first
+# top_k entries stay exact while the top_k-th score is not below the bound.
+# Returns the rows where that no longer holds; they need a full refresh
+# ------------------------------------------------------------
+def rescore_lists(state, rows, norm_ratio):
+    indices, scores = state["indices"][rows], state["scores"][rows]
+    valid = indices >= 0
+    scores = np.where(valid, scores * norm_ratio[np.where(valid, indices, 0)], 0.0).astype(np.float32)
+
+    order = np.argsort(np.where(valid, -scores, np.inf), axis=1, kind="stable")
+    indices = np.take_along_axis(indices, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    state["indices"][rows], state["scores"][rows] = indices, scores
+
+    k = min(top_k, indices.shape[1])
+    exact = (indices[:, k - 1] < 0) | (scores[:, k - 1] >= state["bounds"][rows])
+    return rows[~exact]
+
+
+# ------------------------------------------------------------
+# Apply a batch of new transactions to the state
+# With D = new purchases of the touched customers (rows t):
+#   gram_new = gram + X_t^T D_t + D_t^T X_t + D_t^T D_t
+# Cost of the update: the touched customers' rows of X are read, and the changed Gram entries are
+# written into the pending LIL matrix, so it grows with the batch, not with nnz(gram).
+# Lists are then updated in two ways:
+# - recomputed (one dense row of N scores each): the touched products, products with a changed dot
+#   product (everything the touched customers ever bought) and, if a norm shrank (returns), every
+#   product with a dot product with it
+# - re-sorted in place (O(K) each): other lists that contain a touched product, whose score only
+#   dropped because its norm grew; they are recomputed only if the drop pushes the top_k-th score
+#   below the list's bound (see rescore_lists)
+# Finding the lists that contain a touched product is an O(N x K) scan of the neighbour ids.
+# Worst case: touched customers who bought most of the catalog make every product "changed", and
+# the update costs as much as a full rebuild (N dense rows). Merging into the CSR base happens in save_state.
+# Returns the ids of the recomputed and of the re-sorted products
+# ------------------------------------------------------------
+def apply_transactions(state, df_new):
+    df_new = df_new.dropna(subset=["CustomerID", "Description"])
+    df_new = df_new.assign(Description=df_new["Description"].astype(str).str.strip())
+
+    # Register unseen customers and products with new ids at the end
+    for customer in df_new["CustomerID"].unique():
+        if customer not in state["customer_index"]:
+            state["customer_index"][customer] = len(state["customer_ids"])
+            state["customer_ids"].append(customer)
+    stock_codes = df_new.groupby("Description")["StockCode"].first() if "StockCode" in df_new.columns else {}
+    for product in df_new["Description"].unique():
+        if product not in state["product_index"]:
+            state["product_index"][product] = len(state["product_names"])
+            state["product_names"].append(product)
+            state["stock_codes"].append(str(stock_codes.get(product, "")))
+
+    n_customers, n_items = len(state["customer_ids"]), len(state["product_names"])
+    old_items = state["gram"].shape[0]
+
+    rows = df_new["CustomerID"].map(state["customer_index"]).to_numpy()
+    cols = df_new["Description"].map(state["product_index"]).to_numpy()
+    delta = sparse.coo_matrix(
+        (df_new["Quantity"].to_numpy(dtype=np.float64), (rows, cols)),
+        shape=(n_customers, n_items)
+    ).tocsr()
+
+    resize_matrix(state, "purchases", (n_customers, n_items))
+    resize_matrix(state, "gram", (n_items, n_items))
+
+    # Gram update restricted to the customers that appear in this batch
+    touched_customers = np.unique(rows)
+    x_t = current_rows(state, "purchases", touched_customers)
+    d_t = delta[touched_customers]
+    cross = (x_t.T @ d_t).tocsr()
+    gram_delta = (cross + cross.T + d_t.T @ d_t).tocsr()
+    gram_delta.eliminate_zeros()
+
+    add_pending(state["purchases_pending"], delta)
+    add_pending(state["gram_pending"], gram_delta)
+
+    # Only touched products change length
+    touched_items = np.unique(cols)
+    if n_items > old_items:
+        state["norms"] = np.concatenate([state["norms"], np.zeros(n_items - old_items)])
+    old_norms = state["norms"][touched_items].copy()
+    touched_gram = current_rows(state, "gram", touched_items)
+    state["norms"][touched_items] = np.sqrt(touched_gram[np.arange(len(touched_items)), touched_items].A1)
+
+    if n_items > old_items:
+        k = state["indices"].shape[1]
+        state["indices"] = np.vstack([state["indices"], np.full((n_items - old_items, k), -1, dtype=np.int32)])
+        state["scores"] = np.vstack([state["scores"], np.zeros((n_items - old_items, k), dtype=np.float32)])
+        state["bounds"] = np.concatenate([state["bounds"], np.zeros(n_items - old_items, dtype=np.float32)])
+
+    # Rows to recompute: touched products, products with a changed dot product, and products with a
+    # dot product with a product whose norm shrank (their scores against it grew, so it may enter the list)
+    changed = np.unique(gram_delta.tocoo().row)
+    shrunk = touched_items[state["norms"][touched_items] < old_norms]
+    near_shrunk = np.unique(current_rows(state, "gram", shrunk).indices)
+    recompute_rows = np.union1d(np.union1d(changed, near_shrunk), touched_items)
+
+    # Other lists that contain a touched product only need its score rescaled and the list re-sorted
+    norm_ratio = np.ones(n_items, dtype=np.float32)
+    grown = state["norms"][touched_items] > 0
+    norm_ratio[touched_items[grown]] = old_norms[grown] / state["norms"][touched_items[grown]]
+    listing_touched = np.flatnonzero(np.isin(state["indices"], touched_items).any(axis=1))
+    rescored_rows = np.setdiff1d(listing_touched, recompute_rows)
+    stale = rescore_lists(state, rescored_rows, norm_ratio)
+
+    recompute_rows = np.union1d(recompute_rows, stale)
+    refresh_neighbors(state, recompute_rows)
+    return recompute_rows, np.setdiff1d(rescored_rows, stale)
+
+
+# ------------------------------------------------------------
+# Save / load the state folder
+# ------------------------------------------------------------
+def save_state(state, directory=state_dir):
+    os.makedirs(directory, exist_ok=True)
+    compact_state(state)
+    save_sparse_matrix(os.path.join(directory, "purchases.npz"), state["purchases"])
+    save_sparse_matrix(os.path.join(directory, "gram.npz"), state["gram"])
+    save_array(os.path.join(directory, "norms.npy"), state["norms"])
+    save_array(os.path.join(directory, "bounds.npy"), state["bounds"])
+    save_array(os.path.join(directory, "customer_ids.npy"), np.array(state["customer_ids"], dtype=np.float64))
+    save_neighbor_artifact(os.path.join(directory, "neighbors"), state["indices"], state["scores"])
+    save_vocabulary(product_table(state), products_path=os.path.join(directory, "product_vocab.parquet"))
+
+
+# Product vocabulary table of the state (ids are stable, new products at the end)
+def product_table(state):
+    return pd.DataFrame({
+        "product_id": np.arange(len(state["product_names"]), dtype=np.int32),
+        "StockCode": state["stock_codes"],
+        "Description": state["product_names"],
+    })
+
+
+# ------------------------------------------------------------
+# Initial state from the full cleaned dataset, on the ids of the published vocabularies when they exist
+# (so the state continues the artifacts of save_recommendation_data.py), otherwise on new ones
+# ------------------------------------------------------------
+def initial_state():
+    df = pd.read_parquet(clean_path, columns=["CustomerID", "StockCode", "Description", "Quantity"])
+    df = df.dropna(subset=["CustomerID", "Description"])
+    if os.path.exists(product_vocab_path) and os.path.exists(customer_vocab_path):
+        products, customer_ids = load_product_vocab(), np.asarray(load_customer_ids())
+    else:
+        products, customer_ids = build_vocabulary(df)
+
+    customer_codes = encode_customers(df["CustomerID"], customer_ids)
+    product_codes = encode_products(df["Description"], products["Description"])
+    known = (customer_codes >= 0) & (product_codes >= 0)
+    interaction_matrix = interaction_matrix_from_ids(
+        customer_codes[known],
+        product_codes[known],
+        df["Quantity"].to_numpy()[known],
+        shape=(len(customer_ids), len(products))
+    )
+    return init_state(interaction_matrix, customer_ids, products)
+
+
+def load_state(directory=state_dir):
+    customer_ids = list(np.load(os.path.join(directory, "customer_ids.npy")))
+    products = load_product_vocab(os.path.join(directory, "product_vocab.parquet"))
+    product_names = list(products["Description"])
+    purchases = load_sparse_matrix(os.path.join(directory, "purchases.npz"))
+    gram = load_sparse_matrix(os.path.join(directory, "gram.npz"))
+    indices = np.load(os.path.join(directory, "neighbors_indices.npy"))
+    scores = np.load(os.path.join(directory, "neighbors_scores.npy"))
+    # States saved before bounds were kept: every list was exact when saved, so its last score is the bound
+    bounds_path = os.path.join(directory, "bounds.npy")
+    bounds = np.load(bounds_path) if os.path.exists(bounds_path) else list_bounds(indices, scores)
+    return {
+        "purchases": purchases,
+        "purchases_pending": sparse.lil_matrix(purchases.shape, dtype=np.float64),
+        "gram": gram,
+        "gram_pending": sparse.lil_matrix(gram.shape, dtype=np.float64),
+        "norms": np.load(os.path.join(directory, "norms.npy")),
+        "customer_ids": customer_ids,
+        "customer_index": {c: i for i, c in enumerate(customer_ids)},
+        "product_names": product_names,
+        "stock_codes": list(products["StockCode"]),
+        "product_index": {p: i for i, p in enumerate(product_names)},
+        "indices": indices,
+        "scores": scores,
+        "bounds": bounds,
+    }
+
+
+# ------------------------------------------------------------
+# Append rows for new products to the product-aligned artifacts of the other pipeline scripts
+# The purchase matrix gets empty columns (its customer rows stay aligned with models/customer_ids.npy;
+# purchases folded in here reach it with the next full rebuild), the arrays get rows of fill values
+# and the ANN index gets empty vectors (it is left alone if it was built against another vocabulary:
+# load_ivf_index refuses it until ann_index.py is run again)
+# Recorded vocabulary fingerprints are moved to the new vocabulary only for artifacts built against
+# its first rows (the old vocabulary); artifacts of another vocabulary keep theirs and stay hidden
+# in the app. Fingerprints are written before the arrays, like save_artifact_info
+# ------------------------------------------------------------
+def pad_product_artifacts(product_names):
+    n_items = len(product_names)
+    for prefix, axis in product_aligned_prefixes:
+        info = load_artifact_info(prefix)
+        if "vocab_hash" in info and os.path.exists(f"{prefix}_indices.npy"):
+            n_old = np.load(f"{prefix}_indices.npy", mmap_mode="r").shape[axis]
+            if n_old < n_items and info["vocab_hash"] == vocabulary_hash(product_names[:n_old]):
+                save_artifact_info(prefix, dict(info, vocab_hash=vocabulary_hash(product_names)))
+
+    if os.path.exists(purchases_path):
+        purchase_matrix = load_sparse_matrix(purchases_path)
+        if purchase_matrix.shape[1] < n_items:
+            purchase_matrix.resize((purchase_matrix.shape[0], n_items))
+            save_sparse_matrix(purchases_path, purchase_matrix)
+
+    for path, axis, fill in product_aligned_arrays:
+        if not os.path.exists(path):
+            continue
+        array = np.load(path)
+        missing = n_items - array.shape[axis]
+        if missing > 0:
+            pad_shape = list(array.shape)
+            pad_shape[axis] = missing
+            save_array(path, np.concatenate([array, np.full(pad_shape, fill, dtype=array.dtype)], axis=axis))
+
+    if os.path.exists(ann_index_path):
+        index = load_ivf_index(ann_index_path)
+        if len(index["item_positions"]) < n_items:
+            padded = pad_ivf_index(index, product_names)
+            if padded is not None:
+                save_ivf_index(ann_index_path, padded)
+
+
+if __name__ == "__main__":
+    # ------------------------------------------------------------
+    # Settings of the published neighbour index (written by save_recommendation_data.py)
+    # The Gram update produces cosine scores only, so an index built with another engine is not
+    # overwritten: it needs a full rebuild. Scores are published in the same storage dtype
+    # ------------------------------------------------------------
+    published = load_artifact_info(neighbors_prefix)
+    engine = published.get("engine", "cosine")
+    if engine != "cosine":
+        raise SystemExit(f"{neighbors_prefix} was built with the '{engine}' engine; incremental updates only "
+                         "support cosine. Re-run save_recommendation_data.py instead.")
+    score_dtype = published.get("score_dtype", "float32")
+
+    # ------------------------------------------------------------
+    # Load the state. It is rebuilt from the full cleaned dataset on the first run, and whenever the
+    # published vocabulary is not the one the state was last published with (a full rebuild ran since),
+    # so the state never republishes an older vocabulary over newer artifacts
+    # ------------------------------------------------------------
+    state = load_state() if os.path.exists(os.path.join(state_dir, "gram.npz")) else None
+    if state is not None and os.path.exists(product_vocab_path):
+        if vocabulary_hash(state["product_names"]) != vocabulary_hash(load_product_vocab()["Description"]):
+            print("Published vocabulary changed since the last incremental run; rebuilding the similarity state")
+            state = None
+    if state is None:
+        state = initial_state()
+        print("Initialised similarity state:", state["purchases"].shape)
+    else:
+        print("Loaded similarity state:", state["purchases"].shape)
+
+    # ------------------------------------------------------------
+    # Fold in the new invoices and refresh only the affected top-K lists
+    # ------------------------------------------------------------
+    if os.path.exists(new_transactions_path):
+        df_new = pd.read_parquet(new_transactions_path, columns=["CustomerID", "StockCode", "Description", "Quantity"])
+        start = time.perf_counter()
+        recomputed, rescored = apply_transactions(state, df_new)
+        print(f"Applied {len(df_new)} new rows in {time.perf_counter() - start:.3f}s; "
+              f"recomputed {len(recomputed)} and re-sorted {len(rescored)} of {len(state['product_names'])} product lists")
+    else:
+        print("No new transactions found at", new_transactions_path)
+
+    save_state(state)
+
+    # Publish the refreshed neighbour index for the Streamlit app (new products are appended to the list)
+    # Only the first top_k candidates of each list are published
+    # Product-aligned artifacts are padded first, so none of them is shorter than the new vocabulary
+    pad_product_artifacts(state["product_names"])
+    save_neighbor_artifact(
+        neighbors_prefix, state["indices"][:, :top_k], state["scores"][:, :top_k], score_dtype=score_dtype,
+        info={"engine": "cosine", "vocab_hash": vocabulary_hash(state["product_names"])}
+    )
+    save_vocabulary(product_table(state))
+    save_search_index("models/product_search_index.pkl", build_search_index(state["product_names"]))
+
+    print("Saved:")
+    print(state_dir)
+    print(purchases_path, "and other product-aligned artifacts (padded for new products)")
+    print("models/product_neighbors_indices.npy")
+    print("models/product_neighbors_scores.npy")
+    print("models/product_vocab.parquet")
+    print("models/product_search_index.pkl")
+
+# Q1. Why do we keep the Gram matrix (dot products) instead of the cosine similarities?
+# Answer: New purchases change dot products by simple additions, which can be applied exactly and cheaply.
+# Cosine scores are derived from dot products and norms, so they never need a full rebuild.
+
+# Q2. Why do new products and customers get ids at the end instead of in sorted order?
+# Answer: Existing ids are referenced by the saved neighbour arrays and by the app.
+# Appending keeps every existing id valid, so only the refreshed rows change.
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import time
+import numpy as np
+from vocabulary import load_customer_ids, load_product_names
+
+# Service address (see scoring_service.py)
+host = "127.0.0.1"
+port = 8000
+
+# Load profile: concurrent keep-alive connections and requests per connection, per endpoint
+concurrency = 64
+requests_per_connection = 200
+
+np.random.seed(42)
+
+
+# ------------------------------------------------------------
+# One keep-alive client connection sending POST requests back to back
+# Returns the latency of every request in seconds
+# ------------------------------------------------------------
+async def run_client(path, payloads):
+    reader, writer = await asyncio.open_connection(host, port)
+    latencies = []
+    errors = 0
+    for payload in payloads:
+        body = json.dumps(payload).encode()
+        start = time.perf_counter()
+        writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+        status = (await reader.readline()).split(b" ")[1]
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+
+        latencies.append(time.perf_counter() - start)
+        errors += status != b"200"
+    writer.close()
+    return latencies, errors
+
+
+async def load_test(path, make_payload):
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        run_client(path, [make_payload() for _ in range(requests_per_connection)])
+        for _ in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+
+    latencies = np.concatenate([r[0] for r in results]) * 1000
+    errors = sum(r[1] for r in results)
+    print(f"{path}: {len(latencies)} requests in {elapsed:.2f}s -> {len(latencies) / elapsed:,.0f} req/s, "
+          f"p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms, errors {errors}")
+
+
+async def main():
+    product_names = load_product_names()
+    customer_ids = load_customer_ids()
+
+    def segment_payload():
+        return {
+            "recency": int(np.random.randint(0, 365)),
+            "frequency": int(np.random.randint(1, 50)),
+            "monetary": float(np.random.uniform(10, 5000)),
+        }
+
+    def customer_payload():
+        return {"customer_id": int(customer_ids[np.random.randint(len(customer_ids))])}
+
+    def recommend_payload():
+        return {"product": product_names[np.random.randint(len(product_names))], "top_n": 5}
+
+    print(f"Load test: {concurrency} connections x {requests_per_connection} requests per endpoint")
+    await load_test("/segment", segment_payload)
+    await load_test("/customer", customer_payload)
+    await load_test("/recommend", recommend_payload)
+
+    # Batching statistics reported by the service
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /stats HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    print("Service stats:", response.split(b"\r\n\r\n", 1)[1].decode())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
+# Q1. Why report p99 latency and not only the average?
+# Answer: The slowest requests decide how the storefront feels, and averages hide them.
+# p99 shows whether batching windows or queueing add noticeable delays under load.
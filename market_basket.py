@@ -0,0 +1,185 @@
+import time
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from recommendation_core import save_neighbor_artifact
+from vocabulary import encode_products, load_product_names, vocabulary_hash
+
+# Path to cleaned transaction dataset (InvoiceNo keeps the basket structure)
+clean_path = "data/online_retail_cleaned.parquet"
+
+# Output prefix of the "bought together" artifact read by the recommendation page
+bought_together_prefix = "models/product_bought_together"
+
+# Output tables for analysts
+itemsets_output_path = "data/frequent_itemsets.csv"
+rules_output_path = "data/association_rules.csv"
+
+# Minimum support (share of invoices) for frequent itemsets, and largest itemset size mined
+min_support = 0.01
+max_itemset_size = 3
+
+# Pair rules: minimum number of shared invoices, minimum confidence, ranking metric and rules kept per product
+min_pair_count = 5
+min_confidence = 0.05
+rank_by = "lift"
+top_k = 20
+
+
+# ------------------------------------------------------------
+# Sparse invoice x product incidence matrix (1 = product is in the basket)
+# Rows = invoices, Columns = product ids of models/product_vocab.parquet
+# ------------------------------------------------------------
+def build_basket_matrix(invoice_codes, product_codes, n_invoices, n_products):
+    baskets = sparse.csr_matrix(
+        (np.ones(len(invoice_codes), dtype=np.float32), (invoice_codes, product_codes)),
+        shape=(n_invoices, n_products)
+    )
+    baskets.sum_duplicates()
+    baskets.data[:] = 1.0
+    return baskets
+
+
+# ------------------------------------------------------------
+# Frequent pairs with support, confidence and lift
+# Every CSC column is a product's vertical TID list (the invoices containing it); intersecting all
+# TID lists at once is the sparse product baskets^T @ baskets, restricted to products that are
+# frequent enough on their own (a pair can never be more frequent than either product)
+# Returns one row per directed rule antecedent -> consequent
+# ------------------------------------------------------------
+def mine_pair_rules(baskets, min_pair_count=5):
+    n_invoices = baskets.shape[0]
+    item_counts = np.diff(baskets.tocsc().indptr)
+    candidates = np.flatnonzero(item_counts >= min_pair_count)
+
+    candidate_baskets = baskets[:, candidates]
+    pair_counts = sparse.triu(candidate_baskets.T @ candidate_baskets, k=1).tocoo()
+    keep = pair_counts.data >= min_pair_count
+    a = candidates[pair_counts.row[keep]]
+    b = candidates[pair_counts.col[keep]]
+    counts = pair_counts.data[keep]
+
+    # Both directions: a -> b and b -> a share support and lift, but not confidence
+    antecedents = np.concatenate([a, b]).astype(np.int32)
+    consequents = np.concatenate([b, a]).astype(np.int32)
+    counts = np.concatenate([counts, counts])
+
+    support = counts / n_invoices
+    confidence = counts / item_counts[antecedents]
+    lift = confidence / (item_counts[consequents] / n_invoices)
+    return pd.DataFrame({
+        "antecedent": antecedents,
+        "consequent": consequents,
+        "count": counts.astype(np.int64),
+        "support": support,
+        "confidence": confidence,
+        "lift": lift,
+    })
+
+
+# ------------------------------------------------------------
+# Frequent itemsets (Eclat: depth-first search over vertical TID lists)
+# For each frequent item, only the invoices that contain it are kept (the item's projected database)
+# and the search continues on products with a higher id, so each itemset is counted exactly once.
+# Column counts of the projected sparse matrix are the supports of all extensions in one operation.
+# ------------------------------------------------------------
+def mine_frequent_itemsets(baskets, min_support=0.01, max_size=3):
+    min_count = max(1, int(np.ceil(min_support * baskets.shape[0])))
+    itemsets = []
+
+    def search(projected, items, prefix):
+        counts = np.diff(projected.tocsc().indptr)
+        frequent = np.flatnonzero(counts >= min_count)
+        projected_csc = projected[:, frequent].tocsc()
+        projected_csr = projected_csc.tocsr()
+
+        for position, column in enumerate(frequent):
+            itemset = prefix + (int(items[column]),)
+            itemsets.append((itemset, int(counts[column])))
+
+            if len(itemset) < max_size and position + 1 < len(frequent):
+                tids = projected_csc.indices[projected_csc.indptr[position]:projected_csc.indptr[position + 1]]
+                search(projected_csr[tids][:, position + 1:], items[frequent[position + 1:]], itemset)
+
+    search(sparse.csr_matrix(baskets), np.arange(baskets.shape[1]), ())
+
+    result = pd.DataFrame(itemsets, columns=["items", "count"])
+    result["size"] = result["items"].apply(len)
+    result["support"] = result["count"] / baskets.shape[0]
+    return result
+
+
+# ------------------------------------------------------------
+# Top-K "bought together" lists per product, in the same format as the similarity neighbour artifact
+# (int32 product ids + float32 scores, best first); products with fewer rules are padded with -1 / 0
+# ------------------------------------------------------------
+def top_k_rules(rules, n_products, k, rank_by="lift"):
+    order = np.lexsort((-rules[rank_by].to_numpy(), rules["antecedent"].to_numpy()))
+    ranked = rules.iloc[order]
+
+    antecedents = ranked["antecedent"].to_numpy()
+    group_start = np.searchsorted(antecedents, antecedents, side="left")
+    rank = np.arange(len(ranked)) - group_start
+    keep = rank < k
+
+    indices = np.full((n_products, k), -1, dtype=np.int32)
+    scores = np.zeros((n_products, k), dtype=np.float32)
+    indices[antecedents[keep], rank[keep]] = ranked["consequent"].to_numpy()[keep]
+    scores[antecedents[keep], rank[keep]] = ranked[rank_by].to_numpy()[keep]
+    return indices, scores, ranked[keep]
+
+
+if __name__ == "__main__":
+    df = pd.read_parquet(clean_path, columns=["InvoiceNo", "Description"])
+    df = df.dropna(subset=["Description"])
+
+    # Product ids come from the saved vocabulary so the artifact lines up with the app
+    product_names = load_product_names()
+    product_codes = encode_products(df["Description"], product_names)
+    df = df[product_codes >= 0]
+    product_codes = product_codes[product_codes >= 0]
+    invoice_codes, invoices = pd.factorize(df["InvoiceNo"].astype(str))
+
+    baskets = build_basket_matrix(invoice_codes, product_codes, len(invoices), len(product_names))
+    print("Invoice-Product Matrix Shape:", baskets.shape)
+
+    start = time.perf_counter()
+    rules = mine_pair_rules(baskets, min_pair_count=min_pair_count)
+    rules = rules[rules["confidence"] >= min_confidence]
+    print(f"Mined {len(rules)} pair rules in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    itemsets = mine_frequent_itemsets(baskets, min_support=min_support, max_size=max_itemset_size)
+    print(f"Mined {len(itemsets)} frequent itemsets (support >= {min_support}) in {time.perf_counter() - start:.2f}s")
+
+    indices, scores, top_rules = top_k_rules(rules, len(product_names), top_k, rank_by=rank_by)
+    print("Products with bought-together recommendations:", int((indices[:, 0] >= 0).sum()))
+
+    # ------------------------------------------------------------
+    # Save the serving artifact and readable tables (names only at the very end)
+    # The artifact records the fingerprint of the vocabulary its ids refer to
+    # ------------------------------------------------------------
+    save_neighbor_artifact(bought_together_prefix, indices, scores, info={"vocab_hash": vocabulary_hash(product_names)})
+
+    top_rules = top_rules.assign(
+        antecedent=product_names[top_rules["antecedent"].to_numpy()],
+        consequent=product_names[top_rules["consequent"].to_numpy()],
+    )
+    top_rules.to_csv(rules_output_path, index=False)
+
+    itemsets["items"] = itemsets["items"].apply(lambda ids: " + ".join(product_names[list(ids)]))
+    itemsets.sort_values(["size", "support"], ascending=[True, False]).to_csv(itemsets_output_path, index=False)
+
+    print("Saved:")
+    print(f"{bought_together_prefix}_indices.npy")
+    print(f"{bought_together_prefix}_scores.npy")
+    print(rules_output_path)
+    print(itemsets_output_path)
+
+# Q1. Why mine baskets (invoices) in addition to customer-level similarity?
+# Answer: Customer-level similarity links products bought by the same people at any time.
+# Invoice-level rules capture what is bought in the same order, which is what "bought together" means at checkout.
+
+# Q2. Why rank rules by lift instead of confidence?
+# Answer: Confidence favours best-sellers that appear in almost every basket anyway.
+# Lift measures how much more often two products are bought together than by chance, which reveals genuine bundles.
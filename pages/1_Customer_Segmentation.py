@@ -16,32 +16,33 @@
 
 import streamlit as st
 import numpy as np
-import joblib
-import json
+import pandas as pd
+from app_artifacts import get_customer_index, get_segment_map, get_segmentation_models, get_serving_store
+from customer_index import lookup_customer
 
 # Page configuration for better layout and page title
 st.set_page_config(page_title="Customer Segmentation", layout="wide")
 
 # Page heading and short description
 st.title("Customer Segmentation")
-st.write("Predict customer segment using RFM values (Recency, Frequency, Monetary).")
+st.write("Look up a customer's segment by CustomerID, or predict it from RFM values (Recency, Frequency, Monetary).")
 
 # ------------------------------------------------------------
-# Loading the saved ML models (trained earlier)
-# This avoids retraining the model every time the app runs
+# Loading the saved ML models (trained earlier) and the segment mapping (Cluster ID -> Segment Name)
+# Loaded once per server process and shared by all sessions; reloaded only when the files change
 # ------------------------------------------------------------
-scaler = joblib.load("models/scaler.pkl")
-kmeans = joblib.load("models/kmeans_model_k4.pkl")
+scaler, kmeans = get_segmentation_models()
+segment_map = get_segment_map()
 
-# ------------------------------------------------------------
-# Loading segment mapping (Cluster ID -> Segment Name)
-# This helps show meaningful labels instead of just numbers
-# ------------------------------------------------------------
-with open("models/segment_map.json", "r") as f:
-    segment_map = json.load(f)
+# Optional CustomerID lookup index built by segment_labeling.py (memory-mapped, binary search per lookup)
+customer_index = get_customer_index()
+
+# Optional serving store (serving_store.py), used for lookups only when no customer index is published:
+# the index is rewritten by every segment_labeling.py run, the store only when serving_store.py runs
+serving_store = get_serving_store()
 
-# Convert JSON keys (strings) into integers for correct mapping
-segment_map = {int(k): v for k, v in segment_map.items()}
+# Segment centres in original RFM units, used to explain why a customer belongs to a segment
+segment_centres = scaler.inverse_transform(kmeans.cluster_centers_)
 
 # Divider for clean UI
 st.markdown("---")
@@ -51,28 +52,37 @@ col1, col2 = st.columns([1, 1])
 
 # ------------------------------------------------------------
 # Left side: User Input Section
+# Existing customers are looked up by CustomerID; new profiles are entered as RFM values
 # ------------------------------------------------------------
 with col1:
-    recency = st.number_input(
-        "Recency (days since last purchase)",
-        min_value=0,
-        value=30,
-        step=1
-    )
-
-    frequency = st.number_input(
-        "Frequency (number of purchases)",
-        min_value=0,
-        value=5,
-        step=1
-    )
-
-    monetary = st.number_input(
-        "Monetary (total spend)",
-        min_value=0.0,
-        value=1000.0,
-        step=10.0
-    )
+    can_look_up = customer_index is not None or serving_store is not None
+    modes = ["Look up CustomerID", "Enter RFM values"] if can_look_up else ["Enter RFM values"]
+    mode = st.radio("Input", modes, horizontal=True)
+
+    if mode == "Look up CustomerID":
+        default_id = int(customer_index["customer_ids"][0]) if customer_index is not None else 0
+        customer_id = st.number_input("CustomerID", min_value=0, value=default_id, step=1)
+    else:
+        recency = st.number_input(
+            "Recency (days since last purchase)",
+            min_value=0,
+            value=30,
+            step=1
+        )
+
+        frequency = st.number_input(
+            "Frequency (number of purchases)",
+            min_value=0,
+            value=5,
+            step=1
+        )
+
+        monetary = st.number_input(
+            "Monetary (total spend)",
+            min_value=0.0,
+            value=1000.0,
+            step=10.0
+        )
 
     # Button triggers the prediction
     predict_btn = st.button("Predict Segment")
@@ -85,34 +95,54 @@ with col2:
 
     # Only run prediction when the button is clicked
     if predict_btn:
-        # Create input in the same format as model training (2D array)
-        user_data = np.array([[recency, frequency, monetary]])
-
-        # Scale the user input using the same scaler used during training
-        user_scaled = scaler.transform(user_data)
-
-        # Predict which cluster the user belongs to
-        cluster = int(kmeans.predict(user_scaled)[0])
-
-        # Convert predicted cluster number to segment label
-        segment = segment_map.get(cluster, "Unknown")
-
-        # Display prediction results
-        st.success(f"Predicted Cluster: {cluster}")
-        st.info(f"Customer Segment: {segment}")
-
-        # ------------------------------------------------------------
-        # Business recommendations based on segment
-        # These are practical actions for real-world business usage
-        # ------------------------------------------------------------
-        if segment == "High Value":
-            st.write("Recommended Action: Provide premium offers, loyalty rewards, and early-access deals.")
-        elif segment == "Regular":
-            st.write("Recommended Action: Cross-sell bundles and membership benefits to increase repeat purchases.")
-        elif segment == "Occasional":
-            st.write("Recommended Action: Offer discounts and personalized recommendations to increase engagement.")
-        elif segment == "At Risk":
-            st.write("Recommended Action: Run win-back campaigns, reminders, and limited-time offers.")
+        cluster = None
+        if mode == "Look up CustomerID":
+            # Cluster and segment were assigned by the pipeline; no model call needed
+            if customer_index is not None:
+                customer = lookup_customer(customer_index, customer_id)
+            else:
+                customer = serving_store.get_customer(customer_id)
+            if customer is None:
+                st.warning(f"CustomerID {customer_id} not found.")
+            else:
+                recency, frequency, monetary = customer["Recency"], customer["Frequency"], customer["Monetary"]
+                cluster = customer["Cluster"]
+        else:
+            # Create input in the same format as model training (2D array)
+            user_data = np.array([[recency, frequency, monetary]])
+
+            # Scale the user input using the same scaler used during training
+            user_scaled = scaler.transform(user_data)
+
+            # Predict which cluster the user belongs to
+            cluster = int(kmeans.predict(user_scaled)[0])
+
+        if cluster is not None:
+            # Convert cluster number to segment label
+            segment = segment_map.get(cluster, "Unknown")
+
+            # Display prediction results
+            st.success(f"Predicted Cluster: {cluster}")
+            st.info(f"Customer Segment: {segment}")
+
+            # Why: the customer's RFM values next to the centre of the assigned segment
+            st.table(pd.DataFrame(
+                {"Customer": [recency, frequency, monetary], f"{segment} average": segment_centres[cluster]},
+                index=["Recency", "Frequency", "Monetary"]
+            ).round(2))
+
+            # ------------------------------------------------------------
+            # Business recommendations based on segment
+            # These are practical actions for real-world business usage
+            # ------------------------------------------------------------
+            if segment == "High Value":
+                st.write("Recommended Action: Provide premium offers, loyalty rewards, and early-access deals.")
+            elif segment == "Regular":
+                st.write("Recommended Action: Cross-sell bundles and membership benefits to increase repeat purchases.")
+            elif segment == "Occasional":
+                st.write("Recommended Action: Offer discounts and personalized recommendations to increase engagement.")
+            elif segment == "At Risk":
+                st.write("Recommended Action: Run win-back campaigns, reminders, and limited-time offers.")
 
 # Divider and footer note
 st.markdown("---")
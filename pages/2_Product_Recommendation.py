@@ -1,8 +1,8 @@
-# 1. Why are we loading product_similarity.pkl and product_list.pkl instead of computing cosine similarity inside Streamlit?
-# Answer: Precomputing and saving the similarity matrix makes recommendations instant and keeps the app responsive.
+# 1. Why are we loading the product_neighbors_*.npy arrays and product_vocab.parquet instead of computing cosine similarity inside Streamlit?
+# Answer: Precomputing and saving the top-K neighbour index makes recommendations instant and keeps the app responsive.
 # It avoids heavy matrix computation on every user click, which is important for large datasets.
-# Q2. Why do we drop the same product from similarity scores before selecting the top 5 recommendations?
-# Answer: The input product always has the highest similarity score with itself (score = 1), so it must be removed.
+# Q2. Why does the neighbour index never contain the selected product itself?
+# Answer: The input product always has the highest similarity score with itself (score = 1), so it is removed at build time.
 # This ensures the output contains only genuinely related products instead of repeating the same item.
 
 # Business Insights (Why this method?)
@@ -15,21 +15,41 @@
 # It also highlights high-demand item relationships, helping businesses plan bundles and optimize stock availability.
 
 import streamlit as st
-import joblib
+from app_artifacts import get_recommendation_artifacts, get_segment_map, get_serving_store
+from product_search import search_products
+from segment_recommendations import blend_recommendations, popularity_weight, segment_weight
 
 # Page configuration for better layout and page title
 st.set_page_config(page_title="Product Recommendation", layout="wide")
 
 # Page heading and short description
 st.title("Product Recommendation")
-st.write("Select a product name and get 5 similar recommendations based on cosine similarity.")
+st.write("Search for a product name and get 5 similar recommendations based on cosine similarity.")
 
 # ------------------------------------------------------------
-# Load precomputed similarity matrix and product list
-# This avoids expensive computation inside Streamlit
+# Load precomputed top-K neighbour index and the product id -> name table
+# The index holds only K neighbours per product, so it is tiny compared to the full similarity matrix
+# Arrays are memory-mapped read-only, so all app sessions share one copy from the OS page cache
+# Artifacts are cached per server process (app_artifacts.py), so widget clicks do not reload them
+# All of them come from one validated swap, so every product id they hold is a row of product_names
 # ------------------------------------------------------------
-product_similarity_df = joblib.load("models/product_similarity.pkl")
-product_list = joblib.load("models/product_list.pkl")
+artifacts = get_recommendation_artifacts()
+neighbor_indices, neighbor_scores = artifacts["neighbors"]
+product_names, vocab_hash = artifacts["product_names"], artifacts["vocab_hash"]
+
+# Optional "bought together" lists mined from invoices by market_basket.py (same format, ranked by lift)
+bought_together = artifacts["bought_together"]
+
+# Optional per-segment neighbours and popularity built by segment_recommendations.py
+# Segment ids are the KMeans cluster ids, labelled through segment_map.json
+segment_artifacts = artifacts["segment_artifacts"]
+segment_map = get_segment_map() if segment_artifacts is not None else {}
+
+# Server-side search index built at training time (prefix + character trigram matching)
+search_index = artifacts["search_index"]
+
+# Optional serving store (serving_store.py): one product's neighbours and names in one primary-key read
+serving_store = get_serving_store()
 
 # ------------------------------------------------------------
 # Custom CSS for card-style recommendation output
@@ -63,8 +83,30 @@ col1, col2 = st.columns([1, 1])
 # Left side: Product selection and button
 # ------------------------------------------------------------
 with col1:
-    # Dropdown makes input safe and avoids spelling errors
-    product_name = st.selectbox("Select Product Name", product_list)
+    # Search runs on the server, so only the best matches are sent to the browser
+    # Trigram matching tolerates typos (e.g. "lantrn" still finds LANTERN products)
+    query = st.text_input("Search Product", placeholder="Type part of a product name, e.g. white heart")
+    matches = search_products(search_index, query, limit=20).tolist()
+
+    # Dropdown of matches keeps the final choice safe and avoids spelling errors
+    # Options are product ids; names are only used for display
+    product_id = st.selectbox(
+        "Select Product Name",
+        matches,
+        index=0 if matches else None,
+        format_func=lambda i: product_names[i]
+    )
+    if query and not matches:
+        st.warning("No matching products found.")
+
+    # Customer segment (only shown when segment artifacts exist); "All customers" = plain item neighbours
+    segment = None
+    if segment_map:
+        segment = st.selectbox(
+            "Customer Segment",
+            [None] + sorted(segment_map),
+            format_func=lambda s: "All customers" if s is None else segment_map[s]
+        )
 
     # Button triggers recommendation generation
     recommend_btn = st.button("Get Recommendations")
@@ -76,20 +118,43 @@ with col2:
     st.subheader("Top 5 Recommended Products")
 
     # Only generate recommendations when button is clicked
-    if recommend_btn:
-        # Get similarity scores for selected product
-        similarity_scores = product_similarity_df[product_name].sort_values(ascending=False)
-
-        # Remove the same product from its recommendation list
-        similarity_scores = similarity_scores.drop(product_name)
-
-        # Select top 5 most similar products
-        recommendations = list(similarity_scores.head(5).index)
+    if recommend_btn and product_id is not None:
+        # Neighbours are stored best-first, so the top 5 are simply the first 5 ids
+        # With a segment selected, global and segment neighbours are blended with the segment's popularity
+        # The store answers only when it was built against the loaded vocabulary (vocab_hash); otherwise,
+        # and for products appended after its build, the neighbour arrays are used
+        stored = None
+        if serving_store is not None and segment is None:
+            stored = serving_store.get_neighbors(product_id, 5, vocab_hash)
+        if stored is not None:
+            recommendations = product_names[stored[0]]
+        elif segment is None:
+            top_ids = neighbor_indices[product_id, :5]
+            recommendations = product_names[top_ids[top_ids >= 0]]
+        else:
+            blended_ids, _ = blend_recommendations(
+                product_id, segment, neighbor_indices, neighbor_scores, *segment_artifacts, top_n=5,
+                segment_weight=segment_weight, popularity_weight=popularity_weight
+            )
+            recommendations = product_names[blended_ids]
 
         # Display results in clean card format
         for i, item in enumerate(recommendations, start=1):
             st.markdown(f"<div class='rec-card'>{i}. {item}</div>", unsafe_allow_html=True)
 
+        # Products frequently found in the same invoice (-1 = fewer rules than slots)
+        # Products added after the last market_basket.py run have no row yet
+        if bought_together is not None and product_id < len(bought_together[0]):
+            bought_together_indices, bought_together_scores = bought_together
+            together_ids = bought_together_indices[product_id, :5]
+            keep = (together_ids >= 0) & (together_ids < len(product_names))
+            together_ids = together_ids[keep]
+            if len(together_ids):
+                st.subheader("Frequently Bought Together")
+                lifts = bought_together_scores[product_id, :5][keep]
+                for i, (item, lift) in enumerate(zip(product_names[together_ids], lifts), start=1):
+                    st.markdown(f"<div class='rec-card'>{i}. {item} (lift {lift:.1f})</div>", unsafe_allow_html=True)
+
 # Divider and footer note
 st.markdown("---")
 st.caption("Recommendation Engine: Item-based Collaborative Filtering using Cosine Similarity.")
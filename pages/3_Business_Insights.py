@@ -1,6 +1,6 @@
-# Q1. Why do we load online_retail_cleaned.parquet and customer_segments_labeled.csv instead of using the raw CSV directly?
-# Answer: The cleaned parquet file loads faster and contains validated transactional records, which improves dashboard performance.
-# # The labeled segments file connects clustering outputs to customer-level insights, making the KPIs meaningful and consistent.
+# Q1. Why do we load the business_kpis.json snapshot instead of the transaction data?
+# Answer: The KPIs are computed once by dashboard_kpis.py from the cleaned transactions and labeled segments.
+# The dashboard only reads a few numbers, so its render time does not depend on the number of transactions.
 # Q2. Why are KPI metrics like total revenue, customers, transactions, and products important on the dashboard homepage?
 # Answer: These metrics provide an immediate high-level snapshot of business scale and performance for quick decision-making.
 # They also help validate that the dataset and pipeline are working correctly before deeper analysis.
@@ -13,9 +13,13 @@
 # Q4. Why do we include business use cases like dynamic pricing and inventory optimization in the insights page?
 # Answer: It proves that the analytics pipeline is not just technical, but directly supports revenue, retention, and cost control.
 # These use cases convert customer behavior patterns into practical strategies that stakeholders can implement immediately.
+# Q5. Why does the Sales Explorer read a precomputed cube instead of the transactions?
+# Answer: Every filter combination is materialized by build_sales_cube.py, so a click is a lookup, not a groupby.
+# This keeps the dashboard interactive even for hundreds of thousands of transactions.
 
 import streamlit as st
 import pandas as pd
+from app_artifacts import get_business_kpis, get_sales_cube
 
 # Page configuration for better layout and page title
 st.set_page_config(page_title="Business Insights", layout="wide")
@@ -28,20 +32,19 @@ st.write("Key insights and real-time use cases derived from customer behavior an
 st.markdown("---")
 
 # ------------------------------------------------------------
-# Load cleaned transaction data and labeled customer segments
-# Using cleaned parquet improves speed and ensures valid transactions
+# Load the KPI snapshot built by dashboard_kpis.py from the cleaned transactions and labeled segments
+# Cached per server process and hot-reloaded in the background when the file changes (app_artifacts.py)
 # ------------------------------------------------------------
-df = pd.read_parquet("data/online_retail_cleaned.parquet")
-segments = pd.read_csv("data/customer_segments_labeled.csv")
+kpis = get_business_kpis()
 
 # ------------------------------------------------------------
 # Basic KPIs for business overview
 # These metrics summarize the dataset at a glance
 # ------------------------------------------------------------
-total_customers = segments["CustomerID"].nunique()
-total_transactions = df["InvoiceNo"].nunique()
-total_products = df["Description"].nunique()
-total_revenue = df["TotalPrice"].sum()
+total_customers = kpis["total_customers"]
+total_transactions = kpis["total_transactions"]
+total_products = kpis["total_products"]
+total_revenue = kpis["total_revenue"]
 
 # Display KPIs using Streamlit metrics in 4 columns
 col1, col2, col3, col4 = st.columns(4)
@@ -59,14 +62,62 @@ st.markdown("---")
 # ------------------------------------------------------------
 st.subheader("Customer Segment Distribution")
 
-segment_counts = segments["Segment"].value_counts().reset_index()
-segment_counts.columns = ["Segment", "Customers"]
+segment_counts = pd.DataFrame(list(kpis["segment_counts"].items()), columns=["Segment", "Customers"])
 
 # Display segment distribution in a clean table
 st.dataframe(segment_counts, use_container_width=True)
 
 st.markdown("---")
 
+# ------------------------------------------------------------
+# Sales explorer: interactive filters on the precomputed sales cube (build_sales_cube.py)
+# Every filter combination, including "All", is one precomputed row, so a selection is a few
+# boolean masks on a small table instead of a groupby over all transactions
+# ------------------------------------------------------------
+cube = get_sales_cube()
+if cube is not None:
+    st.subheader("Sales Explorer")
+
+    filters = {}
+    filter_columns = st.columns(4)
+    for column, dimension in zip(filter_columns, ["Country", "Month", "Segment", "Category"]):
+        values = sorted(v for v in cube[dimension].cat.categories if v != "All")
+        filters[dimension] = column.selectbox(dimension, ["All"] + values)
+
+    # Rows matching the selection on every dimension except the ones left free
+    def select(free=()):
+        mask = pd.Series(True, index=cube.index)
+        for dimension, value in filters.items():
+            if dimension in free:
+                mask &= cube[dimension] != "All"
+            else:
+                mask &= cube[dimension] == value
+        return cube[mask]
+
+    selection = select()
+    if len(selection):
+        cell = selection.iloc[0]
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Revenue", f"{cell['Revenue']:,.2f}")
+        m2.metric("Quantity", f"{cell['Quantity']:,}")
+        m3.metric("Invoices", f"{cell['Invoices']:,}")
+        m4.metric("Customers", f"{cell['Customers']:,}")
+
+        # Monthly revenue trend for the selection (all months) and its top categories
+        trend = select(free=("Month",)).sort_values("Month")
+        st.line_chart(trend.set_index(trend["Month"].astype(str))["Revenue"])
+
+        top_categories = select(free=("Category",)).nlargest(10, "Revenue")
+        st.dataframe(
+            top_categories[["Category", "Revenue", "Quantity", "Invoices", "Customers"]].astype({"Category": str}),
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.info("No sales for this selection.")
+
+    st.markdown("---")
+
 # ------------------------------------------------------------
 # Real-world business use cases based on insights from this project
 # These are the key outputs expected in the project submission
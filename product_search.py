@@ -0,0 +1,124 @@
+import re
+import time
+import bisect
+import joblib
+import numpy as np
+from collections import defaultdict
+from vocabulary import load_product_names, vocabulary_hash
+
+# Path of the serialized search index used by the Streamlit recommendation page
+search_index_path = "models/product_search_index.pkl"
+
+# Products matched only by trigrams must share at least this fraction of the query's trigrams
+# (weaker overlaps are unrelated products that happen to share a word start or ending)
+min_trigram_share = 0.35
+
+
+# ------------------------------------------------------------
+# Normalise descriptions and queries the same way
+# Upper case, punctuation removed, repeated spaces collapsed ("Heart  t-light" -> "HEART T LIGHT")
+# ------------------------------------------------------------
+def normalize_text(text):
+    return " ".join(re.sub(r"[^0-9A-Z]+", " ", str(text).upper()).split())
+
+
+# Character trigrams of a string, padded so word starts/ends form their own trigrams
+def char_ngrams(text, n=3):
+    padded = f"  {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+# ------------------------------------------------------------
+# Build the product search index
+# 1. Prefix trie, flattened into sorted arrays: full names and individual words, so "all
+#    products starting with X" is a binary search for the range of keys with that prefix
+# 2. Character trigram inverted index: trigram -> int32 product ids, for ranked, typo-tolerant matching
+# Product ids are the ids of models/product_vocab.parquet, whose fingerprint is stored as vocab_hash
+# ------------------------------------------------------------
+def build_search_index(product_names):
+    names = [normalize_text(name) for name in product_names]
+
+    name_order = sorted(range(len(names)), key=lambda i: names[i])
+    word_pairs = sorted({(word, i) for i, name in enumerate(names) for word in name.split()})
+
+    postings = defaultdict(list)
+    gram_counts = np.zeros(len(names), dtype=np.int32)
+    for i, name in enumerate(names):
+        grams = char_ngrams(name)
+        gram_counts[i] = len(grams)
+        for gram in grams:
+            postings[gram].append(i)
+
+    return {
+        "sorted_names": [names[i] for i in name_order],
+        "sorted_name_ids": np.array(name_order, dtype=np.int32),
+        "sorted_words": [word for word, _ in word_pairs],
+        "sorted_word_ids": np.array([i for _, i in word_pairs], dtype=np.int32),
+        "postings": {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()},
+        "gram_counts": gram_counts,
+        "vocab_hash": vocabulary_hash(product_names),
+    }
+
+
+# Ids whose key starts with prefix (keys are sorted, so they form one contiguous range)
+def _prefix_ids(sorted_keys, sorted_ids, prefix):
+    lo = bisect.bisect_left(sorted_keys, prefix)
+    hi = bisect.bisect_left(sorted_keys, prefix + "\uffff")
+    return sorted_ids[lo:hi]
+
+
+# ------------------------------------------------------------
+# Ranked product search
+# score = trigram Jaccard similarity (typo tolerant), counted only when the product shares at least
+#         min_trigram_share of the query's trigrams
+#       + 1.0 if the whole description starts with the query
+#       + 0.5 if the last query word is the prefix of a word in the description (typeahead)
+# Returns up to `limit` product ids, best first
+# ------------------------------------------------------------
+def search_products(index, query, limit=10):
+    query = normalize_text(query)
+    n_items = len(index["gram_counts"])
+    if not query:
+        return np.empty(0, dtype=np.int32)
+
+    grams = [gram for gram in char_ngrams(query) if gram in index["postings"]]
+    if grams:
+        shared = np.bincount(np.concatenate([index["postings"][gram] for gram in grams]), minlength=n_items)
+    else:
+        shared = np.zeros(n_items, dtype=np.int64)
+    n_query_grams = len(char_ngrams(query))
+    union = n_query_grams + index["gram_counts"] - shared
+    scores = shared / np.maximum(union, 1)
+    scores[shared < min_trigram_share * n_query_grams] = 0.0
+
+    scores[_prefix_ids(index["sorted_names"], index["sorted_name_ids"], query)] += 1.0
+    scores[_prefix_ids(index["sorted_words"], index["sorted_word_ids"], query.split()[-1])] += 0.5
+
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")].astype(np.int32)
+
+
+def save_search_index(path, index):
+    joblib.dump(index, path)
+
+
+def load_search_index(path=search_index_path):
+    return joblib.load(path)
+
+
+if __name__ == "__main__":
+    # Build the index from the saved product vocabulary and time a few typical queries
+    product_names = load_product_names()
+    index = build_search_index(product_names)
+    save_search_index(search_index_path, index)
+
+    for query in ["lantern", "white heart", "hrt", "vintag"]:
+        start = time.perf_counter()
+        result = search_products(index, query, limit=5)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{query!r} ({elapsed:.3f} ms):", list(product_names[result]))
+
+    print("Saved:")
+    print(search_index_path)
@@ -0,0 +1,414 @@
+import json
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+from vocabulary import build_vocabulary, encode_customers, encode_products
+
+
+# ------------------------------------------------------------
+# Build the Customer-Product interaction matrix as a sparse CSR matrix from integer ids
+# Rows = customer ids, Columns = product ids, Values = total quantity purchased
+# Same content as df.pivot_table(..., aggfunc="sum", fill_value=0), but only non-zero purchases are stored
+# ------------------------------------------------------------
+def interaction_matrix_from_ids(customer_codes, product_codes, values, shape):
+    # COO -> CSR sums duplicate (customer, product) entries, which matches aggfunc="sum"
+    return sparse.coo_matrix(
+        (np.asarray(values, dtype=np.float64), (np.asarray(customer_codes), np.asarray(product_codes))),
+        shape=shape
+    ).tocsr()
+
+
+# ------------------------------------------------------------
+# Convenience wrapper: build the vocabularies from df and the matrix indexed by them
+# Returns the matrix, sorted int32 CustomerIDs (row ids) and product names (column ids)
+# ------------------------------------------------------------
+def build_interaction_matrix(df, value_col="Quantity"):
+    df = df.dropna(subset=["CustomerID", "Description"])
+    products, customer_ids = build_vocabulary(df)
+    product_names = products["Description"].to_numpy(dtype=object)
+
+    matrix = interaction_matrix_from_ids(
+        encode_customers(df["CustomerID"], customer_ids),
+        encode_products(df["Description"], product_names),
+        df[value_col],
+        shape=(len(customer_ids), len(product_names))
+    )
+    return matrix, customer_ids, product_names
+
+
+# ------------------------------------------------------------
+# Select the top-N columns of every row of a raw score array with a partial sort
+# np.argpartition finds the N best in O(M) per row, then only those N are sorted (no full O(M log M) sort)
+# exclude = one column id per row to drop (e.g. the query product itself), handled by index, not by name
+# Returns int32 column ids and their scores, both shaped (n_rows, N), best first
+# ------------------------------------------------------------
+def select_top_n(scores, top_n, exclude=None):
+    scores = np.array(scores, ndmin=2)
+    if not np.issubdtype(scores.dtype, np.floating):
+        scores = scores.astype(np.float64)
+    n_rows, n_cols = scores.shape
+
+    if exclude is not None:
+        # Push excluded items below every real score so they are never selected
+        scores[np.arange(n_rows), np.asarray(exclude)] = -np.inf
+        n_cols -= 1
+    top_n = min(top_n, n_cols)
+
+    candidates = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+
+    indices = np.take_along_axis(candidates, order, axis=1).astype(np.int32)
+    return indices, np.take_along_axis(candidate_scores, order, axis=1)
+
+
+# ------------------------------------------------------------
+# Reduce a product x product similarity matrix to the top-K neighbours of every product
+# The product itself is excluded, so row i never contains i
+# row_offset = product id of the first row when the matrix is a block of rows
+# Returns int32 neighbour indices and float32 scores, both shaped (n_products, k), best first
+# ------------------------------------------------------------
+def top_k_neighbors(similarity, k, row_offset=0):
+    self_ids = np.arange(np.shape(similarity)[0]) + row_offset
+    indices, scores = select_top_n(similarity, k, exclude=self_ids)
+    return indices, scores.astype(np.float32)
+
+
+# ------------------------------------------------------------
+# Rows per dense score block so that all threads together stay within block_memory_mb
+# While a block is reduced, a thread holds about 4 arrays of its size: the scores, the copy made by
+# select_top_n, its negation and the int64 argpartition result (8 bytes per value is the upper bound)
+# ------------------------------------------------------------
+def block_rows_for(n_cols, block_memory_mb, n_jobs):
+    return max(1, int(block_memory_mb * 1024 ** 2 // (4 * n_jobs * n_cols * 8)))
+
+
+# ------------------------------------------------------------
+# Blocked, multi-threaded top-K builder for any item-item similarity
+# score_block(start, stop) returns the dense (stop - start) x N similarity rows of those products
+# Each block is reduced to its top-K and discarded, so peak memory is block_memory_mb across all
+# threads instead of N x N (see block_rows_for)
+# ------------------------------------------------------------
+def build_neighbors_blocked(n_items, score_block, k, block_memory_mb=256, n_jobs=None):
+    k = min(k, n_items - 1)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    block_rows = block_rows_for(n_items, block_memory_mb, n_jobs)
+
+    indices = np.empty((n_items, k), dtype=np.int32)
+    scores = np.empty((n_items, k), dtype=np.float32)
+
+    def process_block(start):
+        stop = min(start + block_rows, n_items)
+        indices[start:stop], scores[start:stop] = top_k_neighbors(score_block(start, stop), k, row_offset=start)
+
+    # Sparse products and argpartition release the GIL, so threads share the item matrix without copies
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        list(executor.map(process_block, range(0, n_items, block_rows)))
+
+    return indices, scores
+
+
+# ------------------------------------------------------------
+# Cosine similarity rows of unit-normalised item vectors (plain sparse dot products)
+# ------------------------------------------------------------
+def cosine_block_scorer(item_vectors):
+    item_vectors = normalize(sparse.csr_matrix(item_vectors, dtype=np.float64))
+    item_vectors_t = item_vectors.T.tocsr()
+    return lambda start, stop: (item_vectors[start:stop] @ item_vectors_t).toarray()
+
+
+# ------------------------------------------------------------
+# Item-item cosine similarity on summed quantities, reduced to top-K (the default engine)
+# ------------------------------------------------------------
+def build_item_neighbors(interaction_matrix, k, block_memory_mb=256, n_jobs=None):
+    score_block = cosine_block_scorer(interaction_matrix.T)
+    return build_neighbors_blocked(interaction_matrix.shape[1], score_block, k, block_memory_mb, n_jobs)
+
+
+# ------------------------------------------------------------
+# Save / load the top-K neighbour artifact used by the Streamlit recommendation page
+# Stored as two raw .npy files (<prefix>_indices.npy, <prefix>_scores.npy) so they can be memory-mapped:
+# every app process shares one page-cache copy and loading costs no time regardless of catalog size
+# Product ids are the ids of models/product_vocab.parquet (see vocabulary.py)
+# ------------------------------------------------------------
+def save_array(path, array):
+    # Write to a temp file and rename, so processes that have the old file mapped keep a valid copy
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+
+# Build settings stored next to an artifact (<prefix>_info.json): score dtype, similarity engine,
+# fingerprint of the product vocabulary its ids refer to, ... Written before the arrays, so a reader that
+# finds new arrays also finds their settings
+def save_artifact_info(prefix, info):
+    tmp_path = f"{prefix}_info.json.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(info, f)
+    os.replace(tmp_path, f"{prefix}_info.json")
+
+
+# Settings of an artifact; {} for artifacts saved without them
+def load_artifact_info(prefix):
+    try:
+        with open(f"{prefix}_info.json", "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_neighbor_artifact(prefix, indices, scores, score_dtype="float32", info=None):
+    quantized, scale = quantize_scores(scores, score_dtype)
+    save_artifact_info(prefix, dict(info or {}, score_dtype=score_dtype))
+
+    # int8 scores need their per-row scale. It is written before the scores, so a reader never finds
+    # int8 scores without their scale; float scores ignore a scale file, and a stale one is removed
+    # only after the new float scores are in place
+    scale_path = f"{prefix}_scale.npy"
+    if scale is not None:
+        save_array(scale_path, scale)
+    save_array(f"{prefix}_indices.npy", indices)
+    save_array(f"{prefix}_scores.npy", quantized)
+    if scale is None and os.path.exists(scale_path):
+        os.remove(scale_path)
+
+
+# Scores stay memory-mapped in their stored precision; int8 scores are wrapped in QuantizedScores,
+# which dequantizes only the rows a lookup selects. dequantize=False returns the int8 codes as stored
+# (enough for ranking within a row)
+def load_neighbor_artifact(prefix, mmap_mode="r", dequantize=True):
+    indices = np.load(f"{prefix}_indices.npy", mmap_mode=mmap_mode)
+    scores = np.load(f"{prefix}_scores.npy", mmap_mode=mmap_mode)
+    if dequantize and scores.dtype == np.int8:
+        scores = QuantizedScores(scores, np.load(f"{prefix}_scale.npy", mmap_mode=mmap_mode))
+    return indices, scores
+
+
+# ------------------------------------------------------------
+# Quantized score storage
+# float16: half the size of float32, ~3 significant digits
+# int8: a quarter of the size; each row is scaled by its largest absolute score (row max -> 127)
+# Rankings only need the order of scores within a row, which both formats preserve (up to ties)
+# ------------------------------------------------------------
+def quantize_scores(scores, score_dtype="float32"):
+    scores = np.asarray(scores, dtype=np.float32)
+    if score_dtype in ("float32", "float16"):
+        return scores.astype(score_dtype), None
+    if score_dtype != "int8":
+        raise ValueError(f"Unsupported score dtype '{score_dtype}'. Use float32, float16 or int8.")
+
+    scale = np.abs(scores).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    quantized = np.rint(scores / scale[:, None]).astype(np.int8)
+    return quantized, scale.astype(np.float32)
+
+
+def dequantize_scores(quantized, scale=None):
+    if scale is None:
+        return np.asarray(quantized, dtype=np.float32)
+    return np.asarray(quantized, dtype=np.float32) * np.asarray(scale, dtype=np.float32)[:, None]
+
+
+# ------------------------------------------------------------
+# Read-only view of int8 scores and their per-row scale
+# Indexing works like a NumPy array indexed by rows first (scores[row, :n], scores[rows, :n], scores[rows]):
+# only the selected codes are converted to float32, so the mapped int8 file is never copied as a whole
+# ------------------------------------------------------------
+class QuantizedScores:
+    def __init__(self, codes, scale):
+        if len(scale) != codes.shape[0]:
+            raise ValueError(f"Scale has {len(scale)} rows, scores have {codes.shape[0]}")
+        self.codes = codes
+        self.scale = scale
+        self.shape = codes.shape
+        self.ndim = codes.ndim
+        self.dtype = np.dtype(np.float32)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        rows = key[0] if isinstance(key, tuple) else key
+        values = np.asarray(self.codes[key], dtype=np.float32)
+        row_scale = np.asarray(self.scale[rows], dtype=np.float32)
+        if row_scale.ndim == 0:
+            return values * row_scale
+        return values * row_scale.reshape((-1,) + (1,) * (values.ndim - 1))
+
+    # Full dequantization, only for batch jobs that need every score (e.g. neighbor_matrix)
+    def __array__(self, dtype=None, copy=None):
+        values = dequantize_scores(self.codes, self.scale)
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+
+# ------------------------------------------------------------
+# Sparse product x product matrix holding only the top-K neighbour scores of every product
+# Row i has K non-zeros: the neighbours of product i and their similarity scores
+# ------------------------------------------------------------
+def neighbor_matrix(indices, scores):
+    n_items, k = indices.shape
+    return sparse.csr_matrix(
+        (np.asarray(scores, dtype=np.float32).ravel(), np.asarray(indices).ravel(), np.arange(0, n_items * k + 1, k)),
+        shape=(n_items, n_items)
+    )
+
+
+# ------------------------------------------------------------
+# Turn batch queries into a sparse (n_queries x n_items) basket matrix
+# Accepts a 1-D array of product ids (one product per query), a list of baskets (lists of product ids),
+# or an already built sparse basket matrix (e.g. quantities per basket)
+# ------------------------------------------------------------
+def basket_matrix(queries, n_items):
+    if sparse.issparse(queries):
+        matrix = sparse.csr_matrix(queries, dtype=np.float32)
+        # Products appended to the vocabulary after the matrix was saved have no purchases yet
+        if matrix.shape[1] < n_items:
+            matrix.resize((matrix.shape[0], n_items))
+        return matrix
+
+    if isinstance(queries, np.ndarray) or all(np.isscalar(q) for q in queries):
+        # One product per query
+        columns = np.asarray(queries, dtype=np.int64).ravel()
+        indptr = np.arange(len(columns) + 1)
+    else:
+        lengths = np.array([len(basket) for basket in queries], dtype=np.int64)
+        columns = np.concatenate([np.asarray(basket, dtype=np.int64) for basket in queries] + [np.empty(0, dtype=np.int64)])
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(columns), dtype=np.float32), columns, indptr),
+        shape=(len(indptr) - 1, n_items)
+    )
+    # A product listed twice in a basket still counts once
+    matrix.sum_duplicates()
+    matrix.data[:] = 1.0
+    return matrix
+
+
+# ------------------------------------------------------------
+# Batch recommendations for many products or baskets in one call
+# scores = baskets x item_matrix (one sparse/dense matrix multiply per block of queries)
+# item_matrix = neighbor_matrix(...) for the top-K index, or a dense product x product similarity array
+# Items already in the basket are excluded; blocks of queries run in parallel threads
+# Returns (n_queries x top_n) int32 product ids and float32 scores, best first; -1 pads rows with fewer candidates
+# ------------------------------------------------------------
+def recommend_batch(item_matrix, queries, top_n=5, block_memory_mb=256, n_jobs=None):
+    n_items = item_matrix.shape[1]
+    baskets = basket_matrix(queries, n_items)
+    n_queries = baskets.shape[0]
+
+    top_n = min(top_n, n_items)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    block_rows = block_rows_for(n_items, block_memory_mb, n_jobs)
+
+    indices = np.full((n_queries, top_n), -1, dtype=np.int32)
+    scores = np.zeros((n_queries, top_n), dtype=np.float32)
+
+    def process_block(start):
+        stop = min(start + block_rows, n_queries)
+        block_baskets = baskets[start:stop]
+
+        block = block_baskets @ item_matrix
+        block = block.toarray() if sparse.issparse(block) else np.asarray(block)
+        block = block.astype(np.float32, copy=False)
+
+        # Products with no similarity to the basket, or already in it, are never recommended
+        block[block <= 0] = -np.inf
+        block[block_baskets.nonzero()] = -np.inf
+
+        block_indices, block_scores = select_top_n(block, top_n)
+        missing = np.isneginf(block_scores)
+        block_indices[missing] = -1
+        block_scores[missing] = 0.0
+
+        indices[start:stop] = block_indices
+        scores[start:stop] = block_scores
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        list(executor.map(process_block, range(0, n_queries, block_rows)))
+
+    return indices, scores
+
+
+# ------------------------------------------------------------
+# Save / load a sparse matrix (e.g. the customer x product purchase matrix) as .npz
+# ------------------------------------------------------------
+def save_sparse_matrix(path, matrix):
+    tmp_path = path[:-len(".npz")] + ".tmp.npz"
+    sparse.save_npz(tmp_path, sparse.csr_matrix(matrix))
+    os.replace(tmp_path, path)
+
+
+def load_sparse_matrix(path):
+    return sparse.load_npz(path).tocsr()
+
+
+# ------------------------------------------------------------
+# Personalised recommendations: customer purchase vectors x item-neighbour matrix
+# Purchases are binarised (bought / not bought) so bulk quantities do not dominate the scores,
+# and products the customer already bought are removed from the results
+# customer_rows = row positions in purchase_matrix (None = every customer)
+# ------------------------------------------------------------
+def recommend_for_customers(purchase_matrix, item_matrix, customer_rows=None, top_n=5, block_memory_mb=256, n_jobs=None):
+    purchases = purchase_matrix if customer_rows is None else purchase_matrix[np.atleast_1d(customer_rows)]
+    purchases = sparse.csr_matrix(purchases, dtype=np.float32, copy=True)
+    # Stored zeros (e.g. returns netting out a purchase) are not purchases
+    purchases.eliminate_zeros()
+    purchases.data[:] = 1.0
+    return recommend_batch(item_matrix, purchases, top_n=top_n, block_memory_mb=block_memory_mb, n_jobs=n_jobs)
+
+
+# ------------------------------------------------------------
+# On-demand path for a single customer
+# customer_ids is the sorted CustomerID vocabulary (models/customer_ids.npy), so lookup is a binary search
+# Returns None when the customer has no purchase history
+# ------------------------------------------------------------
+def recommend_for_customer(customer_id, customer_ids, purchase_matrix, item_matrix, top_n=5):
+    row = np.searchsorted(customer_ids, customer_id)
+    if row >= len(customer_ids) or customer_ids[row] != customer_id:
+        return None
+    indices, scores = recommend_for_customers(purchase_matrix, item_matrix, [row], top_n=top_n)
+    keep = indices[0] >= 0
+    return indices[0][keep], scores[0][keep]
+
+
+# ------------------------------------------------------------
+# Low-rank product and customer embeddings via randomized truncated SVD
+# Product columns are unit-normalised first, so X^T X is exactly the item-item cosine matrix;
+# with X ~ U S V^T, X^T X ~ (V S)(V S)^T and the rows of V S are d-dim item vectors whose
+# dot products approximate cosine (re-normalised to unit length for ranking)
+# Storage is O(N x d) float32 instead of O(N^2); customer embeddings U S come for free
+# ------------------------------------------------------------
+def build_embeddings(interaction_matrix, dim=64, random_state=42):
+    dim = min(dim, min(interaction_matrix.shape) - 1)
+    unit_columns = normalize(sparse.csc_matrix(interaction_matrix, dtype=np.float64), axis=0)
+    svd = TruncatedSVD(n_components=dim, algorithm="randomized", random_state=random_state)
+    customer_embeddings = svd.fit_transform(unit_columns)
+    item_embeddings = svd.components_.T * svd.singular_values_
+
+    item_embeddings = normalize(item_embeddings).astype(np.float32)
+    return item_embeddings, customer_embeddings.astype(np.float32), svd.explained_variance_ratio_.sum()
+
+
+# ------------------------------------------------------------
+# On-demand top-N from embeddings: one (queries x d) @ (d x N) product, query products excluded
+# ------------------------------------------------------------
+def recommend_from_embeddings(item_embeddings, product_ids, top_n=5):
+    product_ids = np.atleast_1d(product_ids)
+    scores = item_embeddings[product_ids] @ item_embeddings.T
+    return select_top_n(scores, top_n, exclude=product_ids)
+
+
+# ------------------------------------------------------------
+# Top-K neighbours of every product from embeddings, computed in row blocks like the exact engines
+# (never materializes the N x N score matrix)
+# ------------------------------------------------------------
+def build_embedding_neighbors(item_embeddings, k, block_memory_mb=256, n_jobs=None):
+    def score_block(start, stop):
+        return item_embeddings[start:stop] @ item_embeddings.T
+
+    return build_neighbors_blocked(len(item_embeddings), score_block, k, block_memory_mb, n_jobs)
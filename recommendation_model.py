@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
+from recommendation_core import build_interaction_matrix, select_top_n
 
 # Path to cleaned dataset (contains only valid transactions)
 clean_path = "data/online_retail_cleaned.parquet"
@@ -21,69 +22,67 @@ df = df.dropna(subset=["Description"])
 df["Description"] = df["Description"].astype(str).str.strip()
 
 # ------------------------------------------------------------
-# Create CustomerID-Description matrix (purchase history matrix)
-# Rows = customers
-# Columns = products
-# Values = total quantity purchased (strength of interaction)
+# Create Customer-Product interaction matrix as a sparse CSR matrix
+# Rows = customers, Columns = products, Values = total quantity purchased
+# Only non-zero purchases are stored, so memory grows with transactions, not customers x products
 # ------------------------------------------------------------
-pivot_table = df.pivot_table(
-    index="CustomerID",
-    columns="Description",
-    values="Quantity",
-    aggfunc="sum",
-    fill_value=0
-)
+interaction_matrix, customer_ids, product_names = build_interaction_matrix(df)
 
-# Print matrix shape to confirm scale of recommendation system
-print("Customer-Product Matrix Shape:", pivot_table.shape)
+# Print matrix shape and density to confirm scale of recommendation system
+print("Customer-Product Matrix Shape:", interaction_matrix.shape)
+print("Non-zero entries:", interaction_matrix.nnz, f"(density {interaction_matrix.nnz / np.prod(interaction_matrix.shape):.4%})")
 
 # ------------------------------------------------------------
 # Compute cosine similarity between products
-# Similarity is calculated between product vectors (columns), so we transpose pivot_table
+# Similarity is calculated between product vectors (columns), so we transpose the interaction matrix
 # ------------------------------------------------------------
-product_similarity = cosine_similarity(pivot_table.T)
+product_similarity = cosine_similarity(interaction_matrix.T)
 
-# Convert similarity matrix into a DataFrame for easier lookup and recommendations
-product_similarity_df = pd.DataFrame(
-    product_similarity,
-    index=pivot_table.columns,
-    columns=pivot_table.columns
-)
+# Product name -> column id in the raw similarity array (lookups by index, not by label)
+product_index = {name: i for i, name in enumerate(product_names)}
 
 # Print confirmation and similarity matrix size
 print("Product similarity matrix created.")
-print("Similarity Matrix Shape:", product_similarity_df.shape)
+print("Similarity Matrix Shape:", product_similarity.shape)
 
 # ------------------------------------------------------------
 # Function: Recommend top N similar products based on cosine similarity
 # This matches the project requirement of item-based collaborative filtering
+# Accepts one product name or a list of names; a list is answered in one vectorized call
+# Top N is selected with a partial sort (np.argpartition) and the query product is excluded by index
 # ------------------------------------------------------------
 def recommend_products(product_name, top_n=5):
-    # Handle case where product is not available in the dataset
-    if product_name not in product_similarity_df.index:
-        return f"Product '{product_name}' not found in dataset."
+    single = isinstance(product_name, str)
+    names = [product_name] if single else list(product_name)
 
-    # Sort similar products by similarity score (highest similarity first)
-    similarity_scores = product_similarity_df[product_name].sort_values(ascending=False)
+    # Handle case where product is not available in the dataset
+    for name in names:
+        if name not in product_index:
+            return f"Product '{name}' not found in dataset."
 
-    # Remove the same product itself from recommendations
-    similarity_scores = similarity_scores.drop(product_name)
+    # Similarity rows of all query products, with each product removed from its own results
+    query_ids = np.array([product_index[name] for name in names])
+    top_ids, _ = select_top_n(product_similarity[query_ids], top_n, exclude=query_ids)
 
     # Return only the top N recommended product names
-    return list(similarity_scores.head(top_n).index)
+    recommendations = [list(product_names[row]) for row in top_ids]
+    return recommendations[0] if single else recommendations
 
 # ------------------------------------------------------------
 # Test recommendation output using one sample product from the dataset
 # ------------------------------------------------------------
-test_product = pivot_table.columns[0]
+test_product = product_names[0]
 print("\nExample Product:", test_product)
 print("Top 5 Recommendations:", recommend_products(test_product))
 
-# Q1. Why do we create a CustomerID–Description pivot table for recommendations?
-# Answer: The pivot table captures customer purchase history in a structured matrix format for collaborative filtering.
+# Several products in one call
+print("Batch Recommendations:", recommend_products(list(product_names[:3])))
+
+# Q1. Why do we create a CustomerID–Description interaction matrix for recommendations?
+# Answer: The interaction matrix captures customer purchase history in a structured matrix format for collaborative filtering.
 # It allows us to compare products based on shared buying behavior across customers.
 
-# Q2. Why do we compute cosine similarity on pivot_table.T and not directly on pivot_table?
+# Q2. Why do we compute cosine similarity on interaction_matrix.T and not directly on interaction_matrix?
 # Answer: We want similarity between products, so products must be treated as vectors (columns).
 # Transposing makes each product a vector of customer purchase quantities for accurate similarity scoring.
 
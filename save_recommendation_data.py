@@ -1,17 +1,50 @@
 import pandas as pd
 import numpy as np
-import joblib
-from sklearn.metrics.pairwise import cosine_similarity
+from product_search import build_search_index, save_search_index
+from recommendation_core import (
+    build_embedding_neighbors,
+    build_embeddings,
+    build_item_neighbors,
+    dequantize_scores,
+    interaction_matrix_from_ids,
+    neighbor_matrix,
+    quantize_scores,
+    recommend_for_customers,
+    save_array,
+    save_neighbor_artifact,
+    save_sparse_matrix,
+)
+from similarity_engines import build_engine_neighbors
+from vocabulary import build_vocabulary, encode_customers, encode_products, save_vocabulary, vocabulary_hash
 
 # Path to cleaned transaction dataset (already filtered for valid rows)
 clean_path = "data/online_retail_cleaned.parquet"
 
+# Number of most similar products kept per product in the saved neighbour index
+top_k = 50
+
+# Similarity engine (see similarity_engines.py): cosine, binary_cosine, jaccard, tfidf, bm25
+similarity_engine = "cosine"
+
+# Storage precision of the neighbour scores: float32, float16 or int8 (per-row scaled)
+score_dtype = "float32"
+
+# Memory bound for the dense similarity block each worker thread holds at a time
+block_memory_mb = 256
+
+# Worker threads for the blocked similarity computation (None = all cores)
+n_jobs = None
+
+# Optional low-rank product/customer embeddings (randomized truncated SVD) and their dimension
+build_low_rank_embeddings = False
+embedding_dim = 64
+
 # Load cleaned data for recommendation system creation
 df = pd.read_parquet(clean_path)
 
 # Select only the columns required for building the recommendation model
 # We are not removing data from the dataset, only selecting what is needed for computation
-df = df[["CustomerID", "Description", "Quantity"]]
+df = df[["CustomerID", "StockCode", "Description", "Quantity"]]
 
 # Remove rows with missing CustomerID or Description since they cannot be used for recommendations
 df = df.dropna(subset=["CustomerID", "Description"])
@@ -20,53 +53,124 @@ df = df.dropna(subset=["CustomerID", "Description"])
 df["Description"] = df["Description"].astype(str).str.strip()
 
 # ------------------------------------------------------------
-# Create Customer-Product Interaction Matrix
-# Rows = customers, Columns = products, Values = quantity purchased
-# This represents purchase history strength for collaborative filtering
+# Build the persistent vocabularies and encode every row to integer ids once
+# Product id <-> Description/StockCode and customer id <-> CustomerID, all int32
+# Everything downstream (matrices, artifacts, app lookups) works on these ids, not on strings
 # ------------------------------------------------------------
-pivot_table = df.pivot_table(
-    index="CustomerID",
-    columns="Description",
-    values="Quantity",
-    aggfunc="sum",
-    fill_value=0
-)
+products, customer_ids = build_vocabulary(df)
+product_names = products["Description"].to_numpy(dtype=object)
 
-# Print the size of the matrix to understand the scale of computation
-print("Customer-Product Matrix Shape:", pivot_table.shape)
+df["customer_id"] = encode_customers(df["CustomerID"], customer_ids)
+df["product_id"] = encode_products(df["Description"], product_names)
 
 # ------------------------------------------------------------
-# Compute product-to-product cosine similarity
-# Transpose is used because we want similarity between products (columns)
+# Create Customer-Product interaction matrix as a sparse CSR matrix
+# Rows = customer ids, Columns = product ids, Values = total quantity purchased
+# Only non-zero purchases are stored, so memory grows with transactions, not customers x products
 # ------------------------------------------------------------
-product_similarity = cosine_similarity(pivot_table.T)
+interaction_matrix = interaction_matrix_from_ids(
+    df["customer_id"],
+    df["product_id"],
+    df["Quantity"],
+    shape=(len(customer_ids), len(product_names))
+)
 
-# Convert similarity matrix into a DataFrame for easy lookup in Streamlit
-product_similarity_df = pd.DataFrame(
-    product_similarity,
-    index=pivot_table.columns,
-    columns=pivot_table.columns
+# Print matrix shape and density to confirm scale of recommendation system
+print("Customer-Product Matrix Shape:", interaction_matrix.shape)
+print("Non-zero entries:", interaction_matrix.nnz, f"(density {interaction_matrix.nnz / np.prod(interaction_matrix.shape):.4%})")
+
+# ------------------------------------------------------------
+# Compute product-to-product similarity, keeping only the top-K neighbours of each product
+# Rows are processed in blocks across worker threads and reduced to top-K before the next block,
+# so the full N x N matrix is never held in memory (scales to very large catalogs)
+# Storage drops from O(N^2) float64 to O(N*K) int32 indices + float32 scores
+# ------------------------------------------------------------
+neighbor_indices, neighbor_scores = build_engine_neighbors(
+    interaction_matrix,
+    similarity_engine,
+    top_k,
+    block_memory_mb=block_memory_mb,
+    n_jobs=n_jobs
 )
 
+print("Similarity engine:", similarity_engine)
+print("Neighbour index shape:", neighbor_indices.shape)
+
+# ------------------------------------------------------------
+# Accuracy report for quantized score storage
+# Customer recommendations sum neighbour scores across products, so they are ranked again
+# on the quantized scores and compared with full precision (top-5 overlap)
+# ------------------------------------------------------------
+if score_dtype != "float32":
+    quantized, scale = quantize_scores(neighbor_scores, score_dtype)
+    restored = dequantize_scores(quantized, scale)
+
+    full_top5, _ = recommend_for_customers(interaction_matrix, neighbor_matrix(neighbor_indices, neighbor_scores))
+    quant_top5, _ = recommend_for_customers(interaction_matrix, neighbor_matrix(neighbor_indices, restored))
+    valid = full_top5 >= 0
+    overlap = ((quant_top5[:, :, None] == full_top5[:, None, :]).any(axis=2) & valid).sum() / max(valid.sum(), 1)
+
+    stored_bytes = quantized.nbytes + (scale.nbytes if scale is not None else 0)
+    print(f"Score storage {score_dtype}: {stored_bytes / 1024:.1f} KB vs {neighbor_scores.nbytes / 1024:.1f} KB float32 "
+          f"(max abs error {np.abs(restored - neighbor_scores).max():.5f}, customer top-5 overlap {overlap:.3%})")
+
 # ------------------------------------------------------------
 # Save recommendation artifacts for Streamlit
-# Saving precomputed similarity ensures fast real-time recommendations
+# Neighbour arrays are raw .npy files so the app can memory-map them (shared, zero-copy loading)
+# product_vocab.parquet / customer_ids.npy are the single id <-> name tables for every artifact
+# product_neighbors_info.json records the engine, score dtype and vocabulary fingerprint of this build
 # ------------------------------------------------------------
-joblib.dump(product_similarity_df, "models/product_similarity.pkl")
-joblib.dump(list(pivot_table.columns), "models/product_list.pkl")
+save_neighbor_artifact(
+    "models/product_neighbors", neighbor_indices, neighbor_scores, score_dtype=score_dtype,
+    info={"engine": similarity_engine, "vocab_hash": vocabulary_hash(product_names)}
+)
+save_vocabulary(products, customer_ids)
+
+# Server-side search index (prefix + trigram) so the page never ships the full product list to the browser
+save_search_index("models/product_search_index.pkl", build_search_index(product_names))
+
+# Customer purchase matrix (rows = customer ids), used for personalised recommendations
+save_sparse_matrix("models/customer_purchases.npz", interaction_matrix)
+
+# ------------------------------------------------------------
+# Optional: low-rank embeddings (O(N x d) instead of O(N^2))
+# Similarity becomes a d-dim dot product at query time; quality is reported as recall@5
+# against the exact cosine top-5 neighbours
+# ------------------------------------------------------------
+if build_low_rank_embeddings:
+    item_embeddings, customer_embeddings, explained = build_embeddings(interaction_matrix, embedding_dim)
+
+    if similarity_engine == "cosine":
+        exact_top5 = neighbor_indices[:, :5]
+    else:
+        exact_top5 = build_item_neighbors(interaction_matrix, 5)[0]
+    approx_top5, _ = build_embedding_neighbors(item_embeddings, 5, block_memory_mb=block_memory_mb)
+    recall = (approx_top5[:, :, None] == exact_top5[:, None, :]).any(axis=2).mean()
+
+    print(f"Embeddings: d={item_embeddings.shape[1]}, explained variance {explained:.1%}, "
+          f"recall@5 vs exact cosine {recall:.3f}")
+
+    save_array("models/product_embeddings.npy", item_embeddings)
+    save_array("models/customer_embeddings.npy", customer_embeddings)
+    print("Saved: models/product_embeddings.npy, models/customer_embeddings.npy")
 
 # Confirmation output showing saved model files
 print("Saved:")
-print("models/product_similarity.pkl")
-print("models/product_list.pkl")
+print("models/product_neighbors_indices.npy")
+print("models/product_neighbors_scores.npy")
+print("models/product_neighbors_info.json")
+print("models/product_vocab.parquet")
+print("models/customer_ids.npy")
+print("models/product_search_index.pkl")
+print("models/customer_purchases.npz")
 
-# Q1. Why do we save product_similarity.pkl instead of calculating similarity live in Streamlit?
+# Q1. Why do we save the product_neighbors_*.npy arrays instead of calculating similarity live in Streamlit?
 # Answer: Computing cosine similarity on the full matrix is heavy and would slow down the app.
-# Precomputing and saving makes recommendations instant and improves user experience.
+# Precomputing only the top-K neighbours keeps the artifact small and makes each lookup O(K).
 
-# Q2. Why do we save product_list.pkl separately?
-# Answer: The product list is required to populate the Streamlit dropdown input safely and consistently.
-# It prevents invalid product names and avoids lookup errors in the recommendation engine.
+# Q2. Why do we save the product vocabulary (product_vocab.parquet) separately?
+# Answer: It is the single id <-> name table for every artifact, loaded once by the app.
+# All matrices use integer ids, so names are only needed when results are displayed.
 
 # Q3. How does cosine similarity-based recommendation improve e-commerce performance?
 # Answer: It increases cross-selling by suggesting products that customers commonly buy together.
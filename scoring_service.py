@@ -0,0 +1,310 @@
+import asyncio
+import json
+import time
+from urllib.parse import parse_qsl, urlsplit
+import joblib
+import numpy as np
+import pandas as pd
+from customer_index import current_index_dir, customer_record, find_customers, load_customer_index
+from recommendation_core import load_neighbor_artifact
+from serving_store import ServingStore, current_version
+from vocabulary import load_product_names
+
+# Address the service listens on
+host = "127.0.0.1"
+port = 8000
+
+# Micro-batching: requests arriving within batch_window_ms are scored together (at most max_batch_size)
+batch_window_ms = 2
+max_batch_size = 256
+
+# Largest number of recommendations a client may ask for (the neighbour index keeps top-K per product)
+max_top_n = 20
+
+
+# ------------------------------------------------------------
+# Micro-batcher: coalesces concurrent requests into one vectorized call
+# Each request puts (input, future) on a queue; a single worker takes the first item, waits up to
+# the batch window for more, calls score_batch(inputs) once and resolves every future with its row.
+# Under load the batches fill up, so the per-request cost shrinks to a slice of one NumPy call.
+# ------------------------------------------------------------
+class MicroBatcher:
+    def __init__(self, score_batch, window_ms=2, max_size=256):
+        self.score_batch = score_batch
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.requests = 0
+        self.fallbacks = 0
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items, futures = zip(*batch)
+            try:
+                results = self.score_batch(list(items))
+            except Exception:
+                # One bad input must not fail the whole batch: score the items one at a time,
+                # so only the request that cannot be scored gets the error
+                self.fallbacks += 1
+                for item, future in zip(items, futures):
+                    try:
+                        result = self.score_batch([item])[0]
+                    except Exception as error:
+                        if not future.done():
+                            future.set_exception(error)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+            else:
+                for future, result in zip(futures, results):
+                    if not future.done():
+                        future.set_result(result)
+            self.batches += 1
+            self.requests += len(batch)
+
+
+# ------------------------------------------------------------
+# Scoring functions (artifacts are loaded once at startup)
+# ------------------------------------------------------------
+class ScoringModels:
+    def __init__(self):
+        self.scaler = joblib.load("models/scaler.pkl")
+        self.kmeans = joblib.load("models/kmeans_model_k4.pkl")
+        with open("models/segment_map.json", "r") as f:
+            self.segment_map = {int(k): v for k, v in json.load(f).items()}
+
+        self.neighbor_indices, self.neighbor_scores = load_neighbor_artifact("models/product_neighbors")
+        self.product_names = load_product_names()
+        self.product_index = {name: i for i, name in enumerate(self.product_names)}
+
+        # CustomerID lookup index from segment_labeling.py (optional; /customer answers 404 without it)
+        self.customer_index = load_customer_index() if current_index_dir() is not None else None
+
+        # Serving store with the nightly per-customer recommendations (optional; see serving_store.py)
+        self.store = ServingStore() if current_version() is not None else None
+
+    # RFM rows -> cluster -> segment label, one scaler/KMeans call for the whole batch
+    def segment_batch(self, rows):
+        rfm = pd.DataFrame(rows, columns=["Recency", "Frequency", "Monetary"], dtype=float)
+        if hasattr(self.scaler, "feature_names_in_"):
+            rfm.columns = self.scaler.feature_names_in_
+        clusters = self.kmeans.predict(self.scaler.transform(rfm))
+        return [{"cluster": int(c), "segment": self.segment_map.get(int(c), "Unknown")} for c in clusters]
+
+    # CustomerIDs -> RFM, cluster and segment, one binary search (np.searchsorted) for the whole batch
+    def customer_batch(self, customer_ids):
+        rows = find_customers(self.customer_index, customer_ids)
+        return [customer_record(self.customer_index, row) if row >= 0 else None for row in rows]
+
+    # Product ids -> top-N neighbours, one fancy-index lookup for the whole batch
+    # -1 pads lists with fewer than K neighbours and is dropped before ids are mapped to names
+    def recommend_batch(self, requests):
+        product_ids = np.array([product_id for product_id, _ in requests], dtype=np.int64)
+        top = self.neighbor_indices[product_ids, :max(top_n for _, top_n in requests)]
+        scores = self.neighbor_scores[product_ids, :top.shape[1]]
+        results = []
+        for row, (product_id, top_n) in enumerate(requests):
+            ids, row_scores = top[row, :top_n], scores[row, :top_n]
+            keep = ids >= 0
+            results.append({
+                "product": self.product_names[product_id],
+                "recommendations": list(self.product_names[ids[keep]]),
+                "scores": [round(float(s), 6) for s in row_scores[keep]],
+            })
+        return results
+
+
+# ------------------------------------------------------------
+# Request handlers: validate input, then wait for the batched result
+# Parameters come from the JSON body (POST) or the query string (GET)
+# ------------------------------------------------------------
+async def handle_segment(models, batchers, params):
+    try:
+        row = [float(params["recency"]), float(params["frequency"]), float(params["monetary"])]
+    except (KeyError, TypeError, ValueError):
+        return 400, {"error": "recency, frequency and monetary are required numbers"}
+    if not np.isfinite(row).all():
+        return 400, {"error": "recency, frequency and monetary must be finite numbers"}
+    return 200, await batchers["segment"].submit(row)
+
+
+async def handle_customer(models, batchers, params):
+    if models.customer_index is None:
+        return 404, {"error": "Customer index not built (run segment_labeling.py)"}
+    try:
+        customer_id = int(float(params["customer_id"]))
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return 400, {"error": "customer_id is a required integer"}
+
+    record = await batchers["customer"].submit(customer_id)
+    if record is None:
+        return 404, {"error": f"Unknown customer_id {customer_id}"}
+    return 200, record
+
+
+async def handle_recommend(models, batchers, params):
+    try:
+        top_n = int(params.get("top_n", 5))
+    except (TypeError, ValueError, OverflowError):
+        return 400, {"error": "top_n must be an integer"}
+    if top_n < 1:
+        return 400, {"error": "top_n must be at least 1"}
+    top_n = min(top_n, max_top_n, models.neighbor_indices.shape[1])
+
+    # Personalised: precomputed recommendations of a customer, one primary-key read from the serving store
+    # Ids and names come from the same store version (the store may be newer than product_names)
+    # The SQLite read runs in a worker thread so it does not block the event loop the batchers share
+    if "customer_id" in params:
+        if models.store is None:
+            return 404, {"error": "Serving store not built (run serving_store.py)"}
+        try:
+            customer_id = int(float(params["customer_id"]))
+        except (TypeError, ValueError, OverflowError):
+            return 400, {"error": "customer_id must be an integer"}
+        names = await asyncio.to_thread(models.store.get_recommendation_names, customer_id, top_n)
+        if names is None:
+            return 404, {"error": f"Unknown customer_id {customer_id}"}
+        return 200, {"customer_id": customer_id, "recommendations": names}
+
+    if "product_id" in params:
+        try:
+            product_id = int(params["product_id"])
+        except (TypeError, ValueError, OverflowError):
+            return 400, {"error": "product_id must be an integer"}
+        if not 0 <= product_id < len(models.product_names):
+            return 404, {"error": f"Unknown product_id {product_id}"}
+    elif "product" in params:
+        product_id = models.product_index.get(str(params["product"]).strip())
+        if product_id is None:
+            return 404, {"error": f"Unknown product '{params['product']}'"}
+    else:
+        return 400, {"error": "product, product_id or customer_id is required"}
+
+    return 200, await batchers["recommend"].submit((product_id, top_n))
+
+
+async def handle_stats(models, batchers, params):
+    return 200, {
+        name: {
+            "requests": b.requests, "batches": b.batches, "fallbacks": b.fallbacks,
+            "mean_batch_size": b.requests / max(b.batches, 1),
+        }
+        for name, b in batchers.items()
+    }
+
+
+routes = {
+    "/segment": handle_segment,
+    "/customer": handle_customer,
+    "/recommend": handle_recommend,
+    "/stats": handle_stats,
+}
+
+status_text = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+# ------------------------------------------------------------
+# Minimal HTTP/1.1 server on asyncio streams (keep-alive, JSON in and out)
+# ------------------------------------------------------------
+async def handle_connection(reader, writer, models, batchers):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            url = urlsplit(target)
+            params = dict(parse_qsl(url.query))
+
+            handler = routes.get(url.path)
+            if handler is None:
+                status, payload = 404, {"error": f"Unknown endpoint {url.path}"}
+            else:
+                try:
+                    body_params = json.loads(body) if method == "POST" and body else {}
+                    if isinstance(body_params, dict):
+                        params.update(body_params)
+                        status, payload = await handler(models, batchers, params)
+                    else:
+                        status, payload = 400, {"error": "Body must be a JSON object"}
+                except json.JSONDecodeError:
+                    status, payload = 400, {"error": "Body must be JSON"}
+                except Exception as error:
+                    status, payload = 500, {"error": str(error)}
+
+            data = json.dumps(payload).encode()
+            writer.write(
+                f"HTTP/1.1 {status} {status_text[status]}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def main():
+    start = time.perf_counter()
+    models = ScoringModels()
+    print(f"Artifacts loaded in {time.perf_counter() - start:.2f}s")
+
+    batchers = {
+        "segment": MicroBatcher(models.segment_batch, batch_window_ms, max_batch_size),
+        "customer": MicroBatcher(models.customer_batch, batch_window_ms, max_batch_size),
+        "recommend": MicroBatcher(models.recommend_batch, batch_window_ms, max_batch_size),
+    }
+    workers = [asyncio.create_task(b.run()) for b in batchers.values()]
+
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(reader, writer, models, batchers), host, port
+    )
+    print(f"Scoring service listening on http://{host}:{port} (/segment, /customer, /recommend, /stats)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+# Q1. Why a standalone service instead of calling the Streamlit app?
+# Answer: The storefront needs a plain HTTP API with predictable latency, not a UI script.
+# The service loads the same artifacts once and answers every request from memory.
+
+# Q2. Why coalesce requests into micro-batches?
+# Answer: Scaling, KMeans prediction and neighbour lookups cost almost the same for 1 or 200 rows.
+# Waiting a couple of milliseconds to batch concurrent requests multiplies throughput under load.
@@ -1,4 +1,5 @@
 import pandas as pd
+from customer_index import build_customer_index, customer_index_dir, save_customer_index
 
 # Input file paths generated after clustering
 segments_path = "data/customer_segments.csv"
@@ -72,8 +73,12 @@ rfm["Segment"] = rfm["Cluster"].map(segment_map)
 # Save labeled customer segmentation output
 rfm.to_csv(output_path, index=False)
 
+# Save the CustomerID lookup index (sorted ids + RFM + cluster arrays) used by the app and the scoring service
+save_customer_index(build_customer_index(rfm))
+
 # Print confirmation and customer count per segment
 print("\nSaved labeled segments file:", output_path)
+print("Saved customer lookup index:", customer_index_dir)
 print("\nSegment Counts:")
 print(rfm["Segment"].value_counts())
 
@@ -0,0 +1,157 @@
+import json
+import time
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from recommendation_core import load_neighbor_artifact, load_sparse_matrix, save_array, save_artifact_info
+from similarity_engines import build_engine_neighbors
+from vocabulary import encode_customers, load_customer_ids, load_product_names, vocabulary_hash
+
+# Labeled customer segments (CustomerID, Cluster, Segment) and Cluster -> Segment names
+segments_path = "data/customer_segments_labeled.csv"
+segment_map_path = "models/segment_map.json"
+
+# Output prefixes: per-segment neighbour index (segments x products x K) and per-segment popularity
+segment_neighbors_prefix = "models/segment_neighbors"
+segment_popularity_path = "models/segment_popularity.npy"
+
+# Neighbours kept per product within each segment, and the engine used (see similarity_engines.py)
+top_k = 20
+similarity_engine = "cosine"
+
+# Blend weights used at request time:
+# final score = (1 - segment_weight) * global similarity + segment_weight * segment similarity
+#               + popularity_weight * share of the segment's customers who bought the product
+segment_weight = 0.5
+popularity_weight = 0.2
+
+
+# ------------------------------------------------------------
+# Precompute per-segment artifacts
+# Customers are reordered by segment, so every segment is one contiguous row slice of the CSR matrix:
+# - popularity[s, p] = share of segment s customers who bought product p (one sparse product S @ X for all segments)
+# - neighbors[s] = top-K item neighbours computed only from segment s customers (a loop over the few
+#   segments; each iteration runs the blocked, multi-threaded engine on its row slice)
+# Segment ids are the KMeans cluster ids (rows of segment_map.json); -1 = customer without a segment
+# ------------------------------------------------------------
+def build_segment_artifacts(purchase_matrix, customer_segments, n_segments, k, engine="cosine"):
+    purchases = sparse.csr_matrix(purchase_matrix, dtype=np.float32, copy=True)
+    purchases.data[:] = 1.0
+    n_products = purchases.shape[1]
+
+    has_segment = customer_segments >= 0
+    rows = np.flatnonzero(has_segment)
+    order = rows[np.argsort(customer_segments[rows], kind="stable")]
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(customer_segments[rows], minlength=n_segments))])
+    partitioned = purchases[order]
+
+    segment_indicator = sparse.csr_matrix(
+        (np.ones(len(order), dtype=np.float32), (customer_segments[order], np.arange(len(order)))),
+        shape=(n_segments, len(order))
+    )
+    segment_sizes = np.maximum(np.diff(bounds), 1)
+    popularity = (segment_indicator @ partitioned).toarray() / segment_sizes[:, None]
+
+    k = min(k, n_products - 1)
+    indices = np.full((n_segments, n_products, k), -1, dtype=np.int32)
+    scores = np.zeros((n_segments, n_products, k), dtype=np.float32)
+    for segment in range(n_segments):
+        if bounds[segment + 1] > bounds[segment]:
+            segment_rows = partitioned[bounds[segment]:bounds[segment + 1]]
+            indices[segment], scores[segment] = build_engine_neighbors(segment_rows, engine, k)
+
+    return indices, scores, popularity.astype(np.float32)
+
+
+# The fingerprint of the product vocabulary is written first (see save_artifact_info)
+def save_segment_artifacts(indices, scores, popularity, product_names):
+    save_artifact_info(segment_neighbors_prefix, {"vocab_hash": vocabulary_hash(product_names)})
+    save_array(f"{segment_neighbors_prefix}_indices.npy", indices)
+    save_array(f"{segment_neighbors_prefix}_scores.npy", scores)
+    save_array(segment_popularity_path, popularity)
+
+
+def load_segment_artifacts(mmap_mode="r"):
+    indices, scores = load_neighbor_artifact(segment_neighbors_prefix, mmap_mode=mmap_mode)
+    return indices, scores, np.load(segment_popularity_path, mmap_mode=mmap_mode)
+
+
+# ------------------------------------------------------------
+# Request-time blend for one product and one segment
+# Candidates are only the global and segment neighbours of the product (at most 2K ids),
+# so the blend costs a few vectorized operations on precomputed rows, independent of catalog size
+# ------------------------------------------------------------
+def blend_recommendations(product_id, segment, neighbor_indices, neighbor_scores,
+                          segment_indices, segment_scores, segment_popularity, top_n=5,
+                          segment_weight=0.5, popularity_weight=0.2):
+    # -1 pads lists with fewer than K neighbours
+    global_ids = np.asarray(neighbor_indices[product_id])
+    global_keep = global_ids >= 0
+    global_ids = global_ids[global_keep]
+    local_ids = np.asarray(segment_indices[segment, product_id])
+    local_keep = local_ids >= 0
+    local_ids = local_ids[local_keep]
+
+    candidates = np.union1d(global_ids, local_ids)
+    candidates = candidates[candidates != product_id]
+
+    blended = np.zeros(len(candidates), dtype=np.float32)
+    blended[np.searchsorted(candidates, global_ids)] += (1 - segment_weight) * np.asarray(neighbor_scores[product_id])[global_keep]
+    blended[np.searchsorted(candidates, local_ids)] += segment_weight * np.asarray(segment_scores[segment, product_id])[local_keep]
+
+    popularity = np.asarray(segment_popularity[segment])
+    blended += popularity_weight * popularity[candidates] / max(popularity.max(), 1e-12)
+
+    order = np.argsort(-blended, kind="stable")[:top_n]
+    return candidates[order], blended[order]
+
+
+if __name__ == "__main__":
+    purchase_matrix = load_sparse_matrix("models/customer_purchases.npz")
+    customer_ids = load_customer_ids()
+    product_names = load_product_names()
+
+    with open(segment_map_path, "r") as f:
+        segment_map = {int(k): v for k, v in json.load(f).items()}
+    n_segments = max(segment_map) + 1
+
+    # Segment (cluster id) of every row of the purchase matrix
+    segments = pd.read_csv(segments_path, usecols=["CustomerID", "Cluster"])
+    rows = encode_customers(segments["CustomerID"], customer_ids)
+    customer_segments = np.full(len(customer_ids), -1, dtype=np.int64)
+    customer_segments[rows[rows >= 0]] = segments["Cluster"].to_numpy()[rows >= 0]
+    print("Customers with a segment:", int((customer_segments >= 0).sum()), "of", len(customer_ids))
+
+    start = time.perf_counter()
+    indices, scores, popularity = build_segment_artifacts(
+        purchase_matrix, customer_segments, n_segments, top_k, engine=similarity_engine
+    )
+    print(f"Segment artifacts built in {time.perf_counter() - start:.2f}s")
+
+    save_segment_artifacts(indices, scores, popularity, product_names)
+
+    # ------------------------------------------------------------
+    # Example: the same product recommended to each segment
+    # ------------------------------------------------------------
+    neighbor_indices, neighbor_scores = load_neighbor_artifact("models/product_neighbors")
+    example_product = int(np.argmax(np.diff(purchase_matrix.tocsc().indptr)))
+    print("\nExample Product:", product_names[example_product])
+    for segment, label in sorted(segment_map.items()):
+        ids, _ = blend_recommendations(
+            example_product, segment, neighbor_indices, neighbor_scores, indices, scores, popularity,
+            top_n=5, segment_weight=segment_weight, popularity_weight=popularity_weight
+        )
+        print(f"{label}: {list(product_names[ids])}")
+
+    print("\nSaved:")
+    print(f"{segment_neighbors_prefix}_indices.npy")
+    print(f"{segment_neighbors_prefix}_scores.npy")
+    print(segment_popularity_path)
+
+# Q1. Why precompute segment neighbours and popularity instead of filtering at request time?
+# Answer: Filtering customers by segment and recomputing similarity per click would be far too slow.
+# Precomputed rows turn the segment-aware result into a small blend of two neighbour lists.
+
+# Q2. Why blend with the global neighbours instead of using only segment neighbours?
+# Answer: Small segments have few purchases per product, so their similarities are noisy.
+# The global neighbours keep recommendations stable, while the segment part shifts them towards what that segment buys.
@@ -0,0 +1,330 @@
+import glob
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+from vocabulary import vocabulary_hash
+
+# Serving store directory: one SQLite file per published version plus the CURRENT pointer file
+store_dir = "models/serving_store"
+current_pointer = "CURRENT"
+
+# Published versions kept on disk (older ones are deleted after a new version is switched in)
+keep_versions = 2
+
+# Read-only connections per reader pool
+pool_size = 4
+
+# Readers check the CURRENT pointer at most this often (seconds), not on every query
+refresh_interval = 1.0
+
+schema = """
+CREATE TABLE customers (
+    customer_id INTEGER PRIMARY KEY,
+    recency REAL, frequency REAL, monetary REAL,
+    cluster INTEGER, segment TEXT
+);
+CREATE TABLE products (
+    product_id INTEGER PRIMARY KEY,
+    description TEXT,
+    neighbor_ids BLOB,
+    neighbor_scores BLOB
+);
+CREATE TABLE customer_recommendations (
+    customer_id INTEGER PRIMARY KEY,
+    product_ids BLOB
+);
+CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+# ------------------------------------------------------------
+# Nightly bulk load into a new version file, then atomic switch
+# 1. A new store_<version>.db is written in WAL mode inside one transaction per table
+#    (top-K lists are stored as raw int32/float32 blobs, one row per key)
+# 2. The WAL is checkpointed into the main file and the connection closed
+# 3. CURRENT is replaced with os.replace (atomic rename), so readers see either the old
+#    or the new version, never a half-written model; open connections keep reading their old file
+# metadata holds the build version and the fingerprint of the product vocabulary (vocab_hash), so
+# readers can tell whether the store's product ids are the ids of the vocabulary they loaded
+# ------------------------------------------------------------
+def build_serving_store(customers=None, product_names=None, neighbor_indices=None, neighbor_scores=None,
+                        recommendations=None, path=store_dir):
+    os.makedirs(path, exist_ok=True)
+    version = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    db_path = os.path.join(path, f"store_{version}.db")
+
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # The file is not visible to readers until it is published, so durability per commit is not needed
+    connection.execute("PRAGMA synchronous=OFF")
+    connection.executescript(schema)
+
+    with connection:
+        if customers is not None:
+            connection.executemany(
+                "INSERT INTO customers VALUES (?, ?, ?, ?, ?, ?)",
+                customers.itertuples(index=False, name=None)
+            )
+
+    with connection:
+        if product_names is not None:
+            n_products = len(product_names)
+            connection.executemany(
+                "INSERT INTO products VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        product_id, product_names[product_id],
+                        None if neighbor_indices is None else np.asarray(neighbor_indices[product_id], dtype=np.int32).tobytes(),
+                        None if neighbor_scores is None else np.asarray(neighbor_scores[product_id], dtype=np.float32).tobytes(),
+                    )
+                    for product_id in range(n_products)
+                )
+            )
+
+    with connection:
+        if recommendations is not None:
+            customer_ids, product_ids = recommendations
+            connection.executemany(
+                "INSERT INTO customer_recommendations VALUES (?, ?)",
+                (
+                    (int(customer_id), np.asarray(row, dtype=np.int32).tobytes())
+                    for customer_id, row in zip(customer_ids, product_ids)
+                )
+            )
+
+    with connection:
+        connection.execute("INSERT INTO metadata VALUES ('version', ?)", (version,))
+        if product_names is not None:
+            connection.execute("INSERT INTO metadata VALUES ('vocab_hash', ?)", (vocabulary_hash(product_names),))
+
+    connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    connection.close()
+
+    publish_version(path, os.path.basename(db_path))
+    return db_path
+
+
+def publish_version(path, db_name):
+    tmp_pointer = os.path.join(path, current_pointer + ".tmp")
+    with open(tmp_pointer, "w") as f:
+        f.write(db_name)
+    os.replace(tmp_pointer, os.path.join(path, current_pointer))
+
+    # Old versions are removed; readers that still have them open keep a valid file handle
+    versions = sorted(glob.glob(os.path.join(path, "store_*.db")))
+    for old in versions[:-keep_versions]:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(old + suffix):
+                os.remove(old + suffix)
+
+
+def current_version(path=store_dir):
+    try:
+        with open(os.path.join(path, current_pointer), "r") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _check_top_n(top_n):
+    if top_n < 1:
+        raise ValueError(f"top_n must be at least 1, got {top_n}")
+
+
+# ------------------------------------------------------------
+# Reader: pooled read-only connections to the current version
+# Checkouts compare the CURRENT pointer with the pool's version at most once per refresh_interval;
+# after a nightly switch a new pool is opened on the new file, idle connections of the old pool are
+# closed right away and the ones in use are closed when returned
+# Product lookups take the caller's vocab_hash and answer None when the store was built against another
+# vocabulary; the check and the lookup use one connection, so they always read the same version
+# ------------------------------------------------------------
+class ServingStore:
+    def __init__(self, path=store_dir, pool_size=pool_size, refresh_interval=refresh_interval):
+        self.path = path
+        self.pool_size = pool_size
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.version = None
+        self.pool = None
+        self.next_check = 0.0
+        self._refresh()
+
+    def _connect(self, db_name):
+        uri = f"file:{os.path.join(self.path, db_name)}?mode=ro"
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        connection.execute("PRAGMA query_only=ON")
+        return connection
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        self.next_check = now + self.refresh_interval
+
+        version = current_version(self.path)
+        if version is None:
+            raise FileNotFoundError(f"No serving store published in {self.path}")
+        with self.lock:
+            if version == self.version:
+                return
+            pool = queue.Queue()
+            for _ in range(self.pool_size):
+                pool.put(self._connect(version))
+            old_pool, self.version, self.pool = self.pool, version, pool
+
+            while old_pool is not None and not old_pool.empty():
+                old_pool.get_nowait().close()
+
+    @contextmanager
+    def connection(self):
+        self._refresh()
+        while True:
+            with self.lock:
+                pool = self.pool
+            try:
+                # Short timeout: if the pool is replaced while waiting, the next try uses the new one
+                connection = pool.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        try:
+            yield connection
+        finally:
+            with self.lock:
+                current = pool is self.pool
+                if current:
+                    pool.put(connection)
+            if not current:
+                connection.close()
+
+    @staticmethod
+    def _metadata(connection, key):
+        row = connection.execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    @staticmethod
+    def _names(connection, product_ids):
+        product_ids = [int(i) for i in product_ids]
+        rows = dict(connection.execute(
+            f"SELECT product_id, description FROM products WHERE product_id IN ({','.join('?' * len(product_ids))})",
+            product_ids
+        ).fetchall())
+        return [rows.get(i) for i in product_ids]
+
+    def get_customer(self, customer_id):
+        with self.connection() as connection:
+            row = connection.execute(
+                "SELECT customer_id, recency, frequency, monetary, cluster, segment FROM customers WHERE customer_id = ?",
+                (int(customer_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(["CustomerID", "Recency", "Frequency", "Monetary", "Cluster", "Segment"], row))
+
+    def get_neighbors(self, product_id, top_n=5, vocab_hash=None):
+        _check_top_n(top_n)
+        with self.connection() as connection:
+            if vocab_hash is not None and self._metadata(connection, "vocab_hash") != vocab_hash:
+                return None
+            row = connection.execute(
+                "SELECT neighbor_ids, neighbor_scores FROM products WHERE product_id = ?", (int(product_id),)
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        product_ids, scores = np.frombuffer(row[0], dtype=np.int32), np.frombuffer(row[1], dtype=np.float32)
+        keep = product_ids >= 0
+        return product_ids[keep][:top_n], scores[keep][:top_n]
+
+    def get_product_names(self, product_ids):
+        with self.connection() as connection:
+            return self._names(connection, product_ids)
+
+    def get_recommendations(self, customer_id, top_n=5):
+        _check_top_n(top_n)
+        with self.connection() as connection:
+            row = connection.execute(
+                "SELECT product_ids FROM customer_recommendations WHERE customer_id = ?", (int(customer_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        product_ids = np.frombuffer(row[0], dtype=np.int32)
+        return product_ids[product_ids >= 0][:top_n]
+
+    # Recommended product names of a customer, ids and names read from the same version
+    def get_recommendation_names(self, customer_id, top_n=5):
+        _check_top_n(top_n)
+        with self.connection() as connection:
+            row = connection.execute(
+                "SELECT product_ids FROM customer_recommendations WHERE customer_id = ?", (int(customer_id),)
+            ).fetchone()
+            if row is None:
+                return None
+            product_ids = np.frombuffer(row[0], dtype=np.int32)
+            return self._names(connection, product_ids[product_ids >= 0][:top_n])
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    from concurrent.futures import ThreadPoolExecutor
+    from customer_index import load_customer_index
+    from recommendation_core import load_neighbor_artifact
+    from vocabulary import load_customer_ids, load_product_names
+
+    # ------------------------------------------------------------
+    # Nightly rebuild: customer segments, product top-K neighbours and per-customer recommendations
+    # ------------------------------------------------------------
+    index = load_customer_index()
+    customers = pd.DataFrame({
+        "customer_id": index["customer_ids"].astype(np.int64),
+        "recency": index["rfm"][:, 0],
+        "frequency": index["rfm"][:, 1],
+        "monetary": index["rfm"][:, 2],
+        "cluster": index["clusters"].astype(np.int64),
+        "segment": [index["segment_map"].get(int(c), "Unknown") for c in index["clusters"]],
+    })
+
+    product_names = load_product_names()
+    neighbor_indices, neighbor_scores = load_neighbor_artifact("models/product_neighbors")
+
+    recommendations = None
+    if os.path.exists("models/customer_recommendations.npy"):
+        recommendations = (load_customer_ids(), np.load("models/customer_recommendations.npy", mmap_mode="r"))
+
+    start = time.perf_counter()
+    db_path = build_serving_store(customers, product_names, neighbor_indices, neighbor_scores, recommendations)
+    print(f"Serving store built and published in {time.perf_counter() - start:.2f}s: {db_path}")
+    print(f"Size: {os.path.getsize(db_path) / 1024 ** 2:.1f} MB")
+
+    # ------------------------------------------------------------
+    # Single-key read latency from concurrent reader threads
+    # ------------------------------------------------------------
+    store = ServingStore()
+    example_customer = int(customers["customer_id"].iloc[0])
+    print("\nExample Customer:", store.get_customer(example_customer))
+    ids, _ = store.get_neighbors(0)
+    print("Neighbours of", product_names[0], ":", store.get_product_names(ids))
+
+    product_ids = np.random.default_rng(42).integers(len(product_names), size=20000)
+
+    def timed_read(product_id):
+        t0 = time.perf_counter()
+        store.get_neighbors(product_id)
+        return time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        latencies = np.array(list(executor.map(timed_read, product_ids))) * 1000
+    print(f"Neighbour reads: median {np.median(latencies):.3f} ms, p99 {np.percentile(latencies, 99):.3f} ms")
+
+# Q1. Why a versioned SQLite file instead of updating tables in place?
+# Answer: Readers always query one complete version; the nightly build never touches the live file.
+# Switching the CURRENT pointer with an atomic rename makes the new model visible all at once.
+
+# Q2. Why WAL mode and read-only pooled connections?
+# Answer: WAL lets many readers query without blocking while the file is being checkpointed.
+# A small pool of read-only connections avoids reopening the database on every request.
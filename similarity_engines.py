@@ -0,0 +1,100 @@
+import numpy as np
+from scipy import sparse
+from recommendation_core import build_neighbors_blocked, cosine_block_scorer
+
+# ------------------------------------------------------------
+# Pluggable item-item similarity engines
+# Every engine takes the sparse customer x product matrix and returns score_block(start, stop),
+# the dense similarity rows of products start..stop against all products.
+# build_engine_neighbors() then reduces the blocks to the same top-K artifact format
+# (int32 neighbour ids + float32 scores), so the app can serve any engine unchanged.
+# ------------------------------------------------------------
+
+
+# Product x customer matrix with the given values in place of the quantities
+def _item_matrix(interaction_matrix, data=None):
+    items = sparse.csr_matrix(interaction_matrix.T, dtype=np.float64)
+    items.sum_duplicates()
+    if data is not None:
+        items.data = data(items)
+    return items
+
+
+# Per-customer document frequency: how many different products each customer bought
+def _customer_frequency(items):
+    return np.bincount(items.indices, minlength=items.shape[1])
+
+
+# Cosine on summed raw quantities (original engine; bulk buyers dominate)
+def cosine_engine(interaction_matrix):
+    return cosine_block_scorer(_item_matrix(interaction_matrix))
+
+
+# Cosine on bought / not bought, so quantity size no longer matters
+def binary_cosine_engine(interaction_matrix):
+    return cosine_block_scorer(_item_matrix(interaction_matrix, lambda m: np.ones_like(m.data)))
+
+
+# ------------------------------------------------------------
+# Jaccard similarity via sparse dot products of binary vectors
+# |A and B| = binary dot product, |A or B| = |A| + |B| - |A and B|
+# ------------------------------------------------------------
+def jaccard_engine(interaction_matrix):
+    items = _item_matrix(interaction_matrix, lambda m: np.ones_like(m.data))
+    items_t = items.T.tocsr()
+    counts = np.diff(items.indptr).astype(np.float64)
+
+    def score_block(start, stop):
+        intersection = (items[start:stop] @ items_t).toarray()
+        union = counts[start:stop, None] + counts[None, :] - intersection
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+    return score_block
+
+
+# ------------------------------------------------------------
+# TF-IDF weighted cosine: products are "documents", customers are "terms"
+# tf = log(1 + quantity) damps bulk orders; idf down-weights customers who buy almost everything
+# ------------------------------------------------------------
+def tfidf_engine(interaction_matrix):
+    items = _item_matrix(interaction_matrix)
+    n_items = items.shape[0]
+    idf = np.log((1 + n_items) / (1 + _customer_frequency(items))) + 1
+    items.data = np.log1p(items.data) * idf[items.indices]
+    return cosine_block_scorer(items)
+
+
+# ------------------------------------------------------------
+# BM25 weighted cosine: saturating tf (k1) with product-length normalisation (b)
+# ------------------------------------------------------------
+def bm25_engine(interaction_matrix, k1=1.2, b=0.75):
+    items = _item_matrix(interaction_matrix)
+    n_items = items.shape[0]
+    customer_frequency = _customer_frequency(items)
+    idf = np.log(1 + (n_items - customer_frequency + 0.5) / (customer_frequency + 0.5))
+
+    lengths = np.asarray(items.sum(axis=1)).ravel()
+    row_lengths = np.repeat(lengths / max(lengths.mean(), 1e-12), np.diff(items.indptr))
+    tf = items.data
+    items.data = idf[items.indices] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * row_lengths))
+    return cosine_block_scorer(items)
+
+
+# Registry of available engines (name used in save_recommendation_data.py and the benchmark)
+SIMILARITY_ENGINES = {
+    "cosine": cosine_engine,
+    "binary_cosine": binary_cosine_engine,
+    "jaccard": jaccard_engine,
+    "tfidf": tfidf_engine,
+    "bm25": bm25_engine,
+}
+
+
+# ------------------------------------------------------------
+# Build the top-K neighbour artifact with the named engine
+# ------------------------------------------------------------
+def build_engine_neighbors(interaction_matrix, engine, k, block_memory_mb=256, n_jobs=None):
+    if engine not in SIMILARITY_ENGINES:
+        raise ValueError(f"Unknown similarity engine '{engine}'. Available: {', '.join(SIMILARITY_ENGINES)}")
+    score_block = SIMILARITY_ENGINES[engine](interaction_matrix)
+    return build_neighbors_blocked(interaction_matrix.shape[1], score_block, k, block_memory_mb, n_jobs)
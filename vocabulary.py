@@ -0,0 +1,91 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+
+# Persistent id tables shared by every recommendation artifact
+# product_vocab.parquet: product_id (int32) <-> Description and its most common StockCode
+# customer_ids.npy: sorted CustomerID values as int32 (customer id = position in the array)
+product_vocab_path = "models/product_vocab.parquet"
+customer_vocab_path = "models/customer_ids.npy"
+
+
+# ------------------------------------------------------------
+# Build the product and customer vocabularies from cleaned transactions
+# Products are keyed on the stripped Description (what the app shows), sorted alphabetically
+# Each product keeps its most frequent StockCode so ids can be traced back to the catalogue
+# ------------------------------------------------------------
+def build_vocabulary(df):
+    descriptions = df["Description"].astype(str).str.strip()
+    product_names = np.sort(descriptions.unique())
+
+    products = pd.DataFrame({
+        "product_id": np.arange(len(product_names), dtype=np.int32),
+        "Description": product_names,
+    })
+    if "StockCode" in df.columns:
+        stock_codes = (
+            pd.DataFrame({"Description": descriptions, "StockCode": df["StockCode"].astype(str)})
+            .groupby("Description")["StockCode"]
+            .agg(lambda codes: codes.value_counts().index[0])
+        )
+        products["StockCode"] = products["Description"].map(stock_codes).to_numpy()
+    else:
+        products["StockCode"] = ""
+
+    customer_ids = np.sort(df["CustomerID"].dropna().unique()).astype(np.int32)
+    return products, customer_ids
+
+
+# ------------------------------------------------------------
+# Encode raw values to dense int32 ids (-1 = not in the vocabulary)
+# Categorical codes and searchsorted do the string/number lookups in vectorized form, once per batch
+# ------------------------------------------------------------
+def encode_products(descriptions, product_names):
+    descriptions = pd.Series(descriptions).astype(str).str.strip()
+    return pd.Categorical(descriptions, categories=product_names).codes.astype(np.int32)
+
+
+def encode_customers(customer_values, customer_ids):
+    values = np.asarray(customer_values, dtype=np.int64)
+    positions = np.searchsorted(customer_ids, values)
+    positions = np.minimum(positions, len(customer_ids) - 1)
+    return np.where(customer_ids[positions] == values, positions, -1).astype(np.int32)
+
+
+# ------------------------------------------------------------
+# Fingerprint of a product vocabulary
+# Product ids are positions in the vocabulary, so artifacts indexed by product id record the fingerprint
+# of the vocabulary they were built against; a reader compares it with the vocabulary it loaded
+# (any added, removed, renamed or reordered product changes it)
+# ------------------------------------------------------------
+def vocabulary_hash(product_names):
+    return hashlib.sha1("\0".join(map(str, product_names)).encode("utf-8")).hexdigest()
+
+
+# ------------------------------------------------------------
+# Save / load the vocabularies (written to a temp file and renamed, like the other artifacts)
+# ------------------------------------------------------------
+def save_vocabulary(products, customer_ids=None, products_path=product_vocab_path, customers_path=customer_vocab_path):
+    tmp_path = products_path + ".tmp"
+    products[["product_id", "StockCode", "Description"]].to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, products_path)
+
+    if customer_ids is not None:
+        tmp_path = customers_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(customer_ids, dtype=np.int32))
+        os.replace(tmp_path, customers_path)
+
+
+def load_product_vocab(path=product_vocab_path):
+    return pd.read_parquet(path)
+
+
+# Product names as an array indexed by product id (id -> name in O(1))
+def load_product_names(path=product_vocab_path):
+    return load_product_vocab(path)["Description"].to_numpy(dtype=object)
+
+
+def load_customer_ids(path=customer_vocab_path):
+    return np.load(path, mmap_mode="r")